@@ -15,8 +15,10 @@ import pygame, os, sys
 pygame.init()
 FPS = 30
 
-# initialize the game
-game = JanggiGame.JanggiGame()
+# initialize the game, which is a draw when a position is repeated three times
+# (including by passing back and forth)
+REPETITION_LIMIT = 3
+game = JanggiGame.JanggiGame(repetition_limit=REPETITION_LIMIT)
 board = game.get_board()
 
 # define the screen dimensions
@@ -90,6 +92,9 @@ def draw_game_state():
     elif game_state == 'BLUE_WON':
         text_surface = FONT.render("Checkmate! Blue won!", True, BLUE)
 
+    elif game_state == 'DRAW':
+        text_surface = FONT.render("The game is a draw.", True, BLACK)
+
     else:
         text_surface = FONT.render("Checkmate! Red won!", True, RED)
 
@@ -160,25 +165,9 @@ def is_own_piece(piece_id):
 def id_to_allowed_destinations(piece_id, from_pos):
     """Takes a piece_id (str) and its position (str) and returns a list of
     positions (strings) that the piece is allowed to move to."""
-    # get piece object
-    piece = game.get_current_player().get_pieces()[piece_id]
-
-    # get "allowed" moves, which include those that put or leave the player
-    # in check
-    allowed_moves = piece.get_allowed_moves()
-
     # allowed_destinations do not put or leave the player in check
-    allowed_destinations = []
-
-    # build allowed_destinations by excluding moves from allowed_moves that put
-    # or leave the player in check
-    # each "allowed" move is attempted and undone
-    for position in allowed_moves.keys():
-        captured_piece_id = board.get_occupation(position)
-        if game.make_move(from_pos, position):
-            game.next_turn()
-            game.undo_move(from_pos, position, captured_piece_id)
-            allowed_destinations.append(position)
+    allowed_destinations = [to_pos for _, to_pos in
+                            game.legal_moves_from(from_pos)]
 
     # return list of allowed destinations
     return allowed_destinations
@@ -224,13 +213,16 @@ def main():
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_pos = pygame.mouse.get_pos()
 
-                # enable pass button
+                # enable pass button. Passing is a move from and to the same
+                # position, so it is kept on the move stack and counted for
+                # repetitions.
                 if PASS_BUTTON.collidepoint(mouse_pos):
                     color = game.get_turn()
                     in_check = game.is_in_check(color)
                     if not in_check:
                         piece_selected = False
-                        game.next_turn()
+                        general_pos = board.get_general_position(color)
+                        game.make_move(general_pos, general_pos)
 
                 # handle mouse clicks on board, including piece selection and
                 # movement
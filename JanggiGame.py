@@ -10,6 +10,1644 @@
 # each individual piece's class, and on Wikipedia. JanggiGUI highlights allowed
 # moves, making it beginner-friendly.
 
+import math
+import multiprocessing
+import random
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from enum import Enum
+from types import MappingProxyType
+
+# Board geometry. Internally, positions are stored as squares numbered 0-89,
+# row by row from 'a1' (0) to 'i10' (89), so the square for a position is
+# (row - 1) * 9 + column index.
+COLUMNS = 'abcdefghi'
+NUM_COLS = 9
+NUM_ROWS = 10
+NUM_SQUARES = NUM_COLS * NUM_ROWS
+
+# position (str) of each square, and square (int) of each position
+SQUARE_NAMES = tuple(col + str(row) for row in range(1, NUM_ROWS + 1)
+                     for col in COLUMNS)
+SQUARE_INDEX = {position: square
+                for square, position in enumerate(SQUARE_NAMES)}
+
+# square (int) of each square's mirror image across the e-file, e.g., 'a1' (0)
+# and 'i1' (8). The board and the moves of the pieces are symmetric across the
+# e-file, so a position and its mirror image are equivalent.
+MIRROR_SQUARE = tuple(square + NUM_COLS - 1 - 2 * (square % NUM_COLS)
+                      for square in range(NUM_SQUARES))
+
+# Pieces are stored on the board as small integer codes: the color in the bit
+# above the piece type, so red codes are 1-7, blue codes are 9-15, and 0 is an
+# empty square.
+EMPTY = 0
+GENERAL = 1
+GUARD = 2
+ELEPHANT = 3
+HORSE = 4
+CHARIOT = 5
+CANNON = 6
+SOLDIER = 7
+TYPE_MASK = 7
+
+RED = 0
+BLUE = 1
+COLOR_NAMES = ('red', 'blue')
+COLOR_INDEX = {'red': RED, 'blue': BLUE, 'r': RED, 'b': BLUE}
+
+# piece type (int) for the two letters in the middle of a piece_id
+PIECE_TYPES = {'ge': GENERAL, 'gu': GUARD, 'el': ELEPHANT, 'ho': HORSE,
+               'ch': CHARIOT, 'ca': CANNON, 'so': SOLDIER}
+
+
+def piece_code(piece_id):
+    """Takes a piece_id (str), e.g., 'rch1', and returns the integer code used
+    for the piece on the board."""
+    return COLOR_INDEX[piece_id[0]] << 3 | PIECE_TYPES[piece_id[1:3]]
+
+
+# Moves can be encoded as 16-bit ints: the square moved from times NUM_SQUARES
+# plus the square moved to, or PASS_MOVE for passing the turn. Lists of encoded
+# moves are stored in arrays of unsigned shorts (MOVE_TYPECODE).
+PASS_MOVE = NUM_SQUARES * NUM_SQUARES
+MOVE_TYPECODE = 'H'
+
+
+def encode_move(from_pos, to_pos):
+    """Takes the positions (str) that a piece moves from and to (e.g., 'b3')
+    and returns the encoded move (int). If the positions are the same, the
+    move passes the turn and PASS_MOVE is returned."""
+    if from_pos == to_pos:
+        return PASS_MOVE
+    return SQUARE_INDEX[from_pos] * NUM_SQUARES + SQUARE_INDEX[to_pos]
+
+
+def decode_move(move):
+    """Takes an encoded move (int) and returns the positions (str) that the
+    piece moves from and to, as a tuple (from_pos, to_pos) that can be passed
+    to JanggiGame.make_move. PASS_MOVE is returned as ('a1', 'a1'), because
+    make_move passes the turn when the positions are the same."""
+    if move == PASS_MOVE:
+        return SQUARE_NAMES[0], SQUARE_NAMES[0]
+    return SQUARE_NAMES[move // NUM_SQUARES], SQUARE_NAMES[move % NUM_SQUARES]
+
+
+def mirror_move(move):
+    """Takes an encoded move (int) and returns the encoded move mirrored
+    across the e-file (see MIRROR_SQUARE). PASS_MOVE is its own mirror."""
+    if move == PASS_MOVE:
+        return PASS_MOVE
+    return MIRROR_SQUARE[move // NUM_SQUARES] * NUM_SQUARES + \
+        MIRROR_SQUARE[move % NUM_SQUARES]
+
+
+def mirror_position(position):
+    """Takes a position (str), e.g., 'b3', and returns the position mirrored
+    across the e-file, e.g., 'h3'."""
+    return SQUARE_NAMES[MIRROR_SQUARE[SQUARE_INDEX[position]]]
+
+
+# the palaces, indexed by color
+RED_PALACE = frozenset({'d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3'})
+BLUE_PALACE = frozenset({'d8', 'e8', 'f8', 'd9', 'e9', 'f9',
+                         'd10', 'e10', 'f10'})
+PALACES = (RED_PALACE, BLUE_PALACE)
+PALACE_CORNERS = (('d1', 'f1', 'd3', 'f3'), ('d8', 'f8', 'd10', 'f10'))
+PALACE_CENTERS = ('e2', 'e9')
+
+# steps (row, column) in each direction, where up is toward row 1
+UP, DOWN, LEFT, RIGHT = (-1, 0), (1, 0), (0, -1), (0, 1)
+UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT = (-1, -1), (-1, 1), (1, -1), (1, 1)
+
+
+def _step(position, direction):
+    """Takes a position (str) and a direction (tuple) and returns the adjacent
+    position in that direction, or None if it is off the board."""
+    if position is None:
+        return None
+    col = COLUMNS.find(position[0]) + direction[1]
+    row = int(position[1:]) + direction[0]
+    if col < 0 or col >= NUM_COLS or row < 1 or row > NUM_ROWS:
+        return None
+    return COLUMNS[col] + str(row)
+
+
+def _palace_diagonal(position, color=None):
+    """Takes a position (str) and returns the direction (tuple) that leads
+    from that palace corner through the center of the palace, or None if the
+    position is not a corner. If a color index is given, only that color's
+    palace is considered."""
+    for palace_color, corners in enumerate(PALACE_CORNERS):
+        if color is not None and color != palace_color:
+            continue
+        if position in corners:
+            center = PALACE_CENTERS[palace_color]
+            return (int(center[1:]) - int(position[1:]),
+                    COLUMNS.find(center[0]) - COLUMNS.find(position[0]))
+    return None
+
+
+def _cannon_hyp_moves(position, color):
+    """Returns a cannon's hypothetical moves from the position (str) as a list
+    of (destination, [intermediates]) tuples."""
+    hyp_moves = []
+
+    # the cannon can't move to the adjacent position, so the first destination
+    # has the adjacent position as an intermediate
+    for direction in (UP, DOWN, LEFT, RIGHT):
+        destination = _step(position, direction)
+        intermediates = []
+        while _step(destination, direction) is not None:
+            intermediates.append(destination)
+            destination = _step(destination, direction)
+            hyp_moves.append((destination, list(intermediates)))
+
+    # diagonal jumps from the corners of a palace
+    direction = _palace_diagonal(position)
+    if direction is not None:
+        intermediate = _step(position, direction)  # center of a palace
+        hyp_moves.append((_step(intermediate, direction), [intermediate]))
+
+    return hyp_moves
+
+
+def _chariot_hyp_moves(position, color):
+    """Returns a chariot's hypothetical moves from the position (str) as a list
+    of (destination, [intermediates]) tuples."""
+    hyp_moves = []
+
+    for direction in (UP, DOWN, LEFT, RIGHT):
+        destination = position
+        intermediates = []
+        while _step(destination, direction) is not None:
+            destination = _step(destination, direction)
+            hyp_moves.append((destination, list(intermediates)))
+            intermediates.append(destination)
+
+    # diagonal moves from the corners of a palace
+    direction = _palace_diagonal(position)
+    if direction is not None:
+        center = _step(position, direction)
+        hyp_moves.append((center, []))
+        hyp_moves.append((_step(center, direction), [center]))
+
+    # diagonal moves from the center of a palace
+    for palace_color, center in enumerate(PALACE_CENTERS):
+        if position == center:
+            for corner in PALACE_CORNERS[palace_color]:
+                hyp_moves.append((corner, []))
+
+    return hyp_moves
+
+
+def _elephant_hyp_moves(position, color):
+    """Returns an elephant's hypothetical moves from the position (str) as a
+    list of (destination, [intermediate1, intermediate2]) tuples."""
+    hyp_moves = []
+
+    # each horizontal/vertical direction splits into two diagonal directions
+    for direction, branch_directions in ((UP, (UP_LEFT, UP_RIGHT)),
+                                         (DOWN, (DOWN_LEFT, DOWN_RIGHT)),
+                                         (LEFT, (UP_LEFT, DOWN_LEFT)),
+                                         (RIGHT, (UP_RIGHT, DOWN_RIGHT))):
+        intermediate_1 = _step(position, direction)
+        for branch_direction in branch_directions:
+            intermediate_2 = _step(intermediate_1, branch_direction)
+            destination = _step(intermediate_2, branch_direction)
+            if destination is not None:
+                hyp_moves.append((destination,
+                                  [intermediate_1, intermediate_2]))
+
+    return hyp_moves
+
+
+def _palace_hyp_moves(position, color):
+    """Returns the hypothetical moves of a general or guard from the position
+    (str) as a list of (destination, []) tuples. They can only move within
+    their own palace."""
+    hyp_moves = []
+    palace = PALACES[color]
+
+    for direction in (UP, DOWN, LEFT, RIGHT):
+        destination = _step(position, direction)
+        if destination in palace:
+            hyp_moves.append((destination, []))
+
+    # diagonal moves between the corners and the center
+    center = PALACE_CENTERS[color]
+    if position in PALACE_CORNERS[color]:
+        hyp_moves.append((center, []))
+    if position == center:
+        for corner in PALACE_CORNERS[color]:
+            hyp_moves.append((corner, []))
+
+    return hyp_moves
+
+
+def _horse_hyp_moves(position, color):
+    """Returns a horse's hypothetical moves from the position (str) as a list
+    of (destination, [intermediate]) tuples."""
+    hyp_moves = []
+
+    for direction, branch_directions in ((UP, (UP_LEFT, UP_RIGHT)),
+                                         (DOWN, (DOWN_LEFT, DOWN_RIGHT)),
+                                         (LEFT, (UP_LEFT, DOWN_LEFT)),
+                                         (RIGHT, (UP_RIGHT, DOWN_RIGHT))):
+        intermediate = _step(position, direction)
+        for branch_direction in branch_directions:
+            destination = _step(intermediate, branch_direction)
+            if destination is not None:
+                hyp_moves.append((destination, [intermediate]))
+
+    return hyp_moves
+
+
+def _soldier_hyp_moves(position, color):
+    """Returns a soldier's hypothetical moves from the position (str) as a list
+    of (destination, []) tuples. Blue soldiers move up and red soldiers move
+    down the board."""
+    hyp_moves = []
+    forward = UP if color == BLUE else DOWN
+
+    for direction in (forward, LEFT, RIGHT):
+        destination = _step(position, direction)
+        if destination is not None:
+            hyp_moves.append((destination, []))
+
+    # soldiers can move diagonally forward in the opponent's palace
+    opponent_color = 1 - color
+    center = PALACE_CENTERS[opponent_color]
+    direction = _palace_diagonal(position, opponent_color)
+    if direction is not None and direction[0] == forward[0]:
+        hyp_moves.append((center, []))
+    if position == center:
+        for diagonal in ((forward[0], -1), (forward[0], 1)):
+            hyp_moves.append((_step(position, diagonal), []))
+
+    return hyp_moves
+
+
+def _build_hyp_move_tables():
+    """Returns the tables (HYP_MOVES, HYP_MOVE_DICTS) of every piece's
+    hypothetical moves, indexed by piece code and then by square. Entries of
+    HYP_MOVES are tuples of (destination, (intermediates)) squares, and entries
+    of HYP_MOVE_DICTS are read-only dictionaries in the format of
+    Piece.get_hyp_moves, {destination (str): (intermediates (str))}."""
+    builders = {GENERAL: _palace_hyp_moves, GUARD: _palace_hyp_moves,
+                ELEPHANT: _elephant_hyp_moves, HORSE: _horse_hyp_moves,
+                CHARIOT: _chariot_hyp_moves, CANNON: _cannon_hyp_moves,
+                SOLDIER: _soldier_hyp_moves}
+    hyp_moves = [None] * 16
+    hyp_move_dicts = [None] * 16
+
+    for color in (RED, BLUE):
+        for piece_type, builder in builders.items():
+            code = color << 3 | piece_type
+            square_moves = []
+            square_dicts = []
+            for position in SQUARE_NAMES:
+                moves = builder(position, color)
+                square_moves.append(tuple(
+                    (SQUARE_INDEX[destination],
+                     tuple(SQUARE_INDEX[square] for square in intermediates))
+                    for destination, intermediates in moves))
+                square_dicts.append(MappingProxyType(
+                    {destination: tuple(intermediates)
+                     for destination, intermediates in moves}))
+            hyp_moves[code] = tuple(square_moves)
+            hyp_move_dicts[code] = tuple(square_dicts)
+
+    return tuple(hyp_moves), tuple(hyp_move_dicts)
+
+
+# The hypothetical moves only depend on the piece type, color, and square, so
+# they are computed once, when the module is imported.
+HYP_MOVES, HYP_MOVE_DICTS = _build_hyp_move_tables()
+
+
+def _build_ray_paths():
+    """Returns a table, indexed by square, of the rays that chariots and cannons
+    move along: the four horizontal and vertical directions and the diagonals
+    of a palace. Each ray is a tuple of (square, position, (intermediates))
+    tuples, ordered outward from the starting square, where the intermediates
+    are the positions (str) passed on the way to the square."""
+    ray_paths = []
+
+    for position in SQUARE_NAMES:
+        directions = [UP, DOWN, LEFT, RIGHT]
+        diagonal = _palace_diagonal(position)
+        if diagonal is not None:
+            directions.append(diagonal)
+        if position in PALACE_CENTERS:
+            directions.extend((UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT))
+
+        rays = []
+        for direction in directions:
+            ray = []
+            intermediates = ()
+            destination = _step(position, direction)
+            while destination is not None:
+                ray.append((SQUARE_INDEX[destination], destination,
+                            intermediates))
+                intermediates += (destination,)
+
+                # palace diagonals end at the edge of the palace
+                if direction[0] and direction[1] and \
+                        destination in PALACE_CORNERS[0] + PALACE_CORNERS[1]:
+                    break
+                destination = _step(destination, direction)
+            if ray:
+                rays.append(tuple(ray))
+        ray_paths.append(tuple(rays))
+
+    return tuple(ray_paths)
+
+
+RAY_PATHS = _build_ray_paths()
+
+
+def scan_rays(squares, square, code):
+    """
+    Walks the rays of a chariot or cannon (code) from the square and finds the
+    piece's allowed moves and allowed palace destinations in one pass, stopping
+    each ray as soon as neither can continue.
+
+    Chariots stop at the first piece they meet, which they can capture if it
+    belongs to the opponent. Cannons must jump exactly one piece (the screen),
+    which may not be a cannon, and may then move to any unoccupied position up
+    to and including the next piece, which they can capture if it belongs to the
+    opponent and is not a cannon.
+
+    For the palace destinations (see Piece.update_allowed_palace_destinations)
+    positions occupied by the piece's own color are included, and generals do
+    not block the ray. A general can't be a cannon's screen, though, since the
+    cannon could no longer jump it after the general moves.
+
+    Parameters: squares is the Board's bytearray of piece codes
+    Returns: (allowed_moves, allowed_palace_destinations), in the formats of
+        Piece.get_allowed_moves and Piece.get_allowed_palace_destinations
+    """
+    color = code >> 3
+    is_cannon = code & TYPE_MASK == CANNON
+    opponent_palace = PALACES[1 - color]
+    allowed_moves = {}
+    allowed_palace_destinations = set()
+
+    for ray in RAY_PATHS[square]:
+        moves_open = palace_open = True
+        moves_screened = palace_screened = not is_cannon
+
+        for destination, position, intermediates in ray:
+            occupant = squares[destination]
+
+            if moves_open:
+                if not moves_screened:
+                    # looking for the cannon's screen
+                    if occupant:
+                        if occupant & TYPE_MASK == CANNON:
+                            moves_open = False
+                        else:
+                            moves_screened = True
+                elif not occupant:
+                    allowed_moves[position] = intermediates
+                else:
+                    if occupant >> 3 != color and not \
+                            (is_cannon and occupant & TYPE_MASK == CANNON):
+                        allowed_moves[position] = intermediates
+                    moves_open = False
+
+            if palace_open:
+                if not palace_screened:
+                    if occupant:
+                        if occupant & TYPE_MASK in (CANNON, GENERAL):
+                            palace_open = False
+                        else:
+                            palace_screened = True
+                else:
+                    if position in opponent_palace:
+                        allowed_palace_destinations.add(position)
+                    if occupant and occupant & TYPE_MASK != GENERAL:
+                        palace_open = False
+
+            if not moves_open and not palace_open:
+                break
+
+    return allowed_moves, allowed_palace_destinations
+
+
+# Bitboards represent sets of squares as 90-bit integers, with bit n set for
+# square n. The Board keeps one bitboard per piece code and one per color.
+BITS = tuple(1 << square for square in range(NUM_SQUARES))
+ALL_SQUARES = (1 << NUM_SQUARES) - 1
+PALACE_MASKS = tuple(sum(BITS[SQUARE_INDEX[position]] for position in palace)
+                     for palace in PALACES)
+
+
+def mask_to_positions(mask):
+    """Takes a bitboard (int) and returns the set of positions (str) of its
+    squares."""
+    positions = set()
+    while mask:
+        bit = mask & -mask
+        positions.add(SQUARE_NAMES[bit.bit_length() - 1])
+        mask ^= bit
+    return positions
+
+
+def positions_to_mask(positions):
+    """Takes an iterable of positions (str) and returns their bitboard (int)."""
+    mask = 0
+    for position in positions:
+        mask |= BITS[SQUARE_INDEX[position]]
+    return mask
+
+
+def _build_bitboard_tables():
+    """Returns the tables (STEP_MASKS, LEG_MASKS, RAY_MASKS) used to find moves
+    with bitboards. STEP_MASKS, indexed by code and square, are the
+    destinations of the pieces that move one step (generals, guards, and
+    soldiers). LEG_MASKS, indexed by code and square, are tuples of
+    (leg mask, destination bit) for horses and elephants, which are blocked
+    by any piece on their legs (intermediates). RAY_MASKS, indexed by square,
+    are tuples of (ray mask, ascending) for the rays of chariots and cannons,
+    where ascending is True if the square numbers increase along the ray."""
+    step_masks = [None] * 16
+    leg_masks = [None] * 16
+
+    for code in range(16):
+        if HYP_MOVES[code] is None:
+            continue
+        if code & TYPE_MASK in (GENERAL, GUARD, SOLDIER):
+            step_masks[code] = tuple(
+                sum(BITS[destination] for destination, _ in moves)
+                for moves in HYP_MOVES[code])
+        elif code & TYPE_MASK in (HORSE, ELEPHANT):
+            leg_masks[code] = tuple(
+                tuple((sum(BITS[leg] for leg in legs), BITS[destination])
+                      for destination, legs in moves)
+                for moves in HYP_MOVES[code])
+
+    ray_masks = tuple(
+        tuple((sum(BITS[destination] for destination, _, _ in ray),
+               ray[0][0] > square)
+              for ray in rays)
+        for square, rays in enumerate(RAY_PATHS))
+
+    return tuple(step_masks), tuple(leg_masks), ray_masks
+
+
+STEP_MASKS, LEG_MASKS, RAY_MASKS = _build_bitboard_tables()
+
+
+def _build_footprint_masks():
+    """Returns a table, indexed by code and square, of the squares whose
+    occupation can change a piece's moves: its own square and the destinations
+    and intermediates of its hypothetical moves."""
+    footprint_masks = [None] * 16
+
+    for code, code_moves in enumerate(HYP_MOVES):
+        if code_moves is None:
+            continue
+        masks = []
+        for square, moves in enumerate(code_moves):
+            mask = BITS[square]
+            for destination, intermediates in moves:
+                mask |= BITS[destination]
+                for intermediate in intermediates:
+                    mask |= BITS[intermediate]
+            masks.append(mask)
+        footprint_masks[code] = tuple(masks)
+
+    return tuple(footprint_masks)
+
+
+FOOTPRINT_MASKS = _build_footprint_masks()
+
+
+def _build_path_masks():
+    """Returns a table, indexed by code and square, of dictionaries
+    {destination (int): bitboard (int) of the intermediates} of the
+    hypothetical moves. The intermediates are the squares that must be empty
+    for the piece to reach the destination, or that hold the screen of a
+    cannon."""
+    path_masks = [None] * 16
+
+    for code, code_moves in enumerate(HYP_MOVES):
+        if code_moves is None:
+            continue
+        path_masks[code] = tuple(
+            MappingProxyType(
+                {destination: sum(BITS[intermediate]
+                                  for intermediate in intermediates)
+                 for destination, intermediates in moves})
+            for moves in code_moves)
+
+    return tuple(path_masks)
+
+
+PATH_MASKS = _build_path_masks()
+
+# Zobrist keys: random 64-bit ints for each piece code on each square, and for
+# red to move. The hash of a position is the XOR of the keys of its pieces and,
+# if red is to move, ZOBRIST_RED_TO_MOVE. The seed is fixed so that the hashes
+# are the same every time the module is imported.
+ZOBRIST_SEED = 20210527
+
+
+def _build_zobrist_keys():
+    """Returns the table of Zobrist keys (int), indexed by code and square,
+    and the key for red to move."""
+    rng = random.Random(ZOBRIST_SEED)
+    keys = tuple(tuple(rng.getrandbits(64) for _ in range(NUM_SQUARES))
+                 for _ in range(16))
+    return keys, rng.getrandbits(64)
+
+
+ZOBRIST_KEYS, ZOBRIST_RED_TO_MOVE = _build_zobrist_keys()
+
+# Evaluation (see JanggiGame.evaluate). The material value (int) of each piece
+# type in points, indexed by type: EMPTY, GENERAL, GUARD, ELEPHANT, HORSE,
+# CHARIOT, CANNON, SOLDIER. Generals can't be captured, so they have no value.
+PIECE_VALUES = (0, 0, 3, 3, 5, 13, 7, 2)
+
+# Scores are kept as ints in tenths of a point. Red moves second, so they get
+# the 1.5 point handicap (deom) used in Janggi scoring.
+EVAL_SCALE = 10
+RED_HANDICAP = 15
+
+
+def _build_piece_square_tables():
+    """Returns the default piece-square tables, indexed by code, of the
+    points (int, in tenths) that each piece is worth on each square in addition
+    to its material. Soldiers are worth more as they advance toward the
+    opponent's palace, and the other pieces have no bonuses."""
+    # bonus of a red soldier on each row, from row 1 to row 10
+    soldier_rows = (0, 0, 0, 0, 0, 1, 2, 3, 3, 1)
+    tables = [None] * 16
+    for color in (RED, BLUE):
+        for piece_type in range(GENERAL, SOLDIER):
+            tables[color << 3 | piece_type] = (0,) * NUM_SQUARES
+        tables[color << 3 | SOLDIER] = tuple(
+            soldier_rows[square // NUM_COLS if color == RED
+                         else NUM_ROWS - 1 - square // NUM_COLS]
+            for square in range(NUM_SQUARES))
+    return tuple(tables)
+
+
+DEFAULT_PIECE_SQUARE_TABLES = _build_piece_square_tables()
+
+
+def build_square_values(piece_square_tables):
+    """Takes piece-square tables (see DEFAULT_PIECE_SQUARE_TABLES), where a
+    table can be None for no bonuses, and returns a table, indexed by code and
+    square, of what each piece is worth (int, in tenths) on each square: its
+    material plus its bonus, positive for red and negative for blue. The
+    Board adds up these values as the pieces move (see Board.get_score)."""
+    square_values = [(0,) * NUM_SQUARES] * 16
+    for code, table in enumerate(piece_square_tables):
+        if not code & TYPE_MASK:
+            continue
+        if table is None:
+            table = (0,) * NUM_SQUARES
+        sign = 1 if code >> 3 == RED else -1
+        material = PIECE_VALUES[code & TYPE_MASK] * EVAL_SCALE
+        square_values[code] = tuple(sign * (material + bonus)
+                                    for bonus in table)
+    return tuple(square_values)
+
+
+DEFAULT_SQUARE_VALUES = build_square_values(DEFAULT_PIECE_SQUARE_TABLES)
+
+# values of the pieces in static exchanges (see static_exchange), where a
+# general is worth more than all of the other pieces so that it is never
+# exchanged
+EXCHANGE_VALUES = (0, 1000, 3, 3, 5, 13, 7, 2)
+
+# Search (see JanggiGame.search). The score of checkmating the opponent (in
+# tenths of a point), less the number of moves it takes
+MATE_SCORE = 100000
+DEFAULT_SEARCH_DEPTH = 4
+MAX_SEARCH_DEPTH = 64
+
+# scores at least this far from 0 are checkmates (see MATE_SCORE)
+MATE_THRESHOLD = MATE_SCORE - MAX_SEARCH_DEPTH
+
+# Monte Carlo tree search (see MonteCarloTreeSearch): the default number of
+# playouts per move, the number of random moves in a rollout before it is
+# scored with JanggiGame.evaluate, the UCT exploration constant, and the
+# number of rollouts given to each process at a time
+DEFAULT_PLAYOUTS = 1000
+ROLLOUT_PLIES = 80
+UCT_EXPLORATION = 1.4
+ROLLOUTS_PER_PROCESS = 4
+
+# proof or disproof number of a node that can't be proven or disproven (see
+# JanggiGame.find_mate), and the default limit on the nodes of a proof tree
+PROOF_INFINITY = 1 << 30
+DEFAULT_MATE_NODES = 100000
+
+
+def score_to_table(score, ply):
+    """Takes a score (int) relative to the root of a search and the number of
+    moves (int) from the root to the position, and returns the score to store
+    in a TranspositionTable. Checkmate scores are stored by the number of
+    moves from the position rather than from the root, so that they are right
+    when the position is reached at another ply or in another search."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Takes a score (int) from a TranspositionTable and the number of moves
+    (int) from the root to the position, and returns the score relative to the
+    root (see score_to_table)."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+# bounds of the scores in the transposition table: the score is exact, at
+# least the score (the search was cut off), or at most the score
+EXACT_BOUND = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+def _first_blocker(ray_mask, ascending, occupied):
+    """Returns the bit (int) of the first occupied square along the ray, or 0
+    if the ray is empty."""
+    blockers = ray_mask & occupied
+    if not blockers or ascending:
+        return blockers & -blockers
+    return 1 << (blockers.bit_length() - 1)
+
+
+def _ray_through(ray_mask, ascending, bit):
+    """Returns the squares of the ray up to and including the bit."""
+    if ascending:
+        return ray_mask & ((bit << 1) - 1)
+    return ray_mask & -bit
+
+
+def _ray_beyond(ray_mask, ascending, bit):
+    """Returns the squares of the ray after the bit."""
+    if ascending:
+        return ray_mask & -(bit << 1)
+    return ray_mask & (bit - 1)
+
+
+def move_masks(bitboards, occupied, code, square):
+    """
+    Finds the moves of a piece with bitboards. The allowed moves and allowed
+    palace destinations follow the same rules as Piece.update_allowed_moves and
+    Piece.update_allowed_palace_destinations (see also scan_rays), except that
+    a general's moves are left to JanggiGame.update_generals.
+
+    Parameters: bitboards and occupied are the Board's lists of bitboards by
+        piece code and by color, code is the piece's code, and square is the
+        square (int) it is on.
+    Returns: (allowed_mask, palace_mask) bitboards (int)
+    """
+    piece_type = code & TYPE_MASK
+    color = code >> 3
+    own = occupied[color]
+    everything = own | occupied[1 - color]
+    generals = bitboards[GENERAL] | bitboards[8 | GENERAL]
+    opponent_palace = PALACE_MASKS[1 - color]
+
+    if piece_type == GENERAL:
+        return 0, 0
+
+    if piece_type == GUARD or piece_type == SOLDIER:
+        destinations = STEP_MASKS[code][square]
+        return destinations & ~own, destinations & opponent_palace
+
+    allowed_mask = palace_mask = 0
+
+    if piece_type == HORSE or piece_type == ELEPHANT:
+        not_generals = everything & ~generals
+        for legs, destination in LEG_MASKS[code][square]:
+            if not legs & everything and not destination & own:
+                allowed_mask |= destination
+            if not legs & not_generals:
+                palace_mask |= destination
+        return allowed_mask, palace_mask & opponent_palace
+
+    if piece_type == CHARIOT:
+        not_generals = everything & ~generals
+        for ray, ascending in RAY_MASKS[square]:
+            blocker = _first_blocker(ray, ascending, everything)
+            if blocker:
+                allowed_mask |= _ray_through(ray, ascending, blocker) & ~own
+            else:
+                allowed_mask |= ray
+            blocker = _first_blocker(ray, ascending, not_generals)
+            if blocker:
+                palace_mask |= _ray_through(ray, ascending, blocker)
+            else:
+                palace_mask |= ray
+        return allowed_mask, palace_mask & opponent_palace
+
+    # cannons jump exactly one piece, which may not be a cannon
+    cannons = bitboards[CANNON] | bitboards[8 | CANNON]
+    not_generals = everything & ~generals
+    for ray, ascending in RAY_MASKS[square]:
+        screen = _first_blocker(ray, ascending, everything)
+        if not screen or screen & cannons:
+            continue
+        beyond = _ray_beyond(ray, ascending, screen)
+        target = _first_blocker(beyond, ascending, everything)
+        if target:
+            allowed_mask |= _ray_through(beyond, ascending, target) & \
+                            ~(target & (own | cannons))
+        else:
+            allowed_mask |= beyond
+
+        # a general can't be the screen for the palace destinations, but
+        # generals beyond the screen don't block them
+        if screen & generals:
+            continue
+        target = _first_blocker(beyond, ascending, not_generals)
+        if target:
+            palace_mask |= _ray_through(beyond, ascending, target)
+        else:
+            palace_mask |= beyond
+
+    return allowed_mask, palace_mask & opponent_palace
+
+
+def _step_attacker(bitboards, code, bit):
+    """Returns the square (int) of a piece with the code that moves one step
+    (a general, guard, or soldier) and can move to the bit's square, or None
+    if there isn't one."""
+    pieces = bitboards[code]
+    while pieces:
+        piece_bit = pieces & -pieces
+        if STEP_MASKS[code][piece_bit.bit_length() - 1] & bit:
+            return piece_bit.bit_length() - 1
+        pieces ^= piece_bit
+    return None
+
+
+def _leg_attacker(bitboards, code, square, blockers):
+    """Returns the square (int) of a horse or elephant with the code that can
+    move to the square, where its legs (intermediates) must not hold any of
+    the blockers (bitboard), or None if there isn't one."""
+    pieces = bitboards[code]
+    while pieces:
+        piece_bit = pieces & -pieces
+        legs = PATH_MASKS[code][piece_bit.bit_length() - 1].get(square)
+        if legs is not None and not legs & blockers:
+            return piece_bit.bit_length() - 1
+        pieces ^= piece_bit
+    return None
+
+
+def _ray_attackers(bitboards, occupied, square, color, blockers,
+                   cannon_target):
+    """Returns a tuple (chariot bit, cannon bit) of a chariot and a cannon of
+    the color that can move to the square along its rays, including the
+    palace diagonals, where each bit is 0 if there isn't one. Chariots are the
+    first of the blockers (bitboard) along a ray, and cannons are the first
+    piece after a screen that isn't a cannon. If cannon_target is False, the
+    square holds a cannon, which cannons can't capture."""
+    everything = occupied[RED] | occupied[BLUE]
+    cannons = bitboards[CANNON] | bitboards[8 | CANNON]
+    chariots = bitboards[color << 3 | CHARIOT]
+    own_cannons = bitboards[color << 3 | CANNON] if cannon_target else 0
+    chariot_bit = cannon_bit = 0
+    for ray, ascending in RAY_MASKS[square]:
+        first = _first_blocker(ray, ascending, blockers)
+        if not first:
+            continue
+        if first & chariots and not chariot_bit:
+            chariot_bit = first
+        if not own_cannons or cannon_bit or first & cannons:
+            continue
+        beyond = _ray_beyond(ray, ascending, first)
+        second = _first_blocker(beyond, ascending, everything)
+        if second & own_cannons:
+            cannon_bit = second
+    return chariot_bit, cannon_bit
+
+
+def is_attacked(bitboards, occupied, square, color, palace=False):
+    """
+    Determines whether any piece of a color other than the general can move to
+    a square, by looking outward from the square for the pieces that could
+    reach it, rather than finding the moves of every piece. The moves follow
+    the same rules as move_masks.
+
+    Parameters: bitboards and occupied are the Board's lists of bitboards by
+        piece code and by color, square is the square (int), and color is the
+        color (int RED or BLUE) of the attacking pieces. If palace is True,
+        the rules for the palace destinations are used instead of the rules
+        for the allowed moves: generals don't block the pieces, a square
+        occupied by a piece of the attacking color counts (it is protected),
+        and a general can't be the screen of a cannon.
+    Returns: True if the square is attacked, otherwise False
+    """
+    bit = BITS[square]
+    everything = occupied[RED] | occupied[BLUE]
+
+    if palace:
+        blockers = everything & ~(bitboards[GENERAL] | bitboards[8 | GENERAL])
+        cannon_target = True
+    else:
+        # pieces can't capture a piece of the same color, and cannons can't
+        # capture cannons
+        if bit & occupied[color]:
+            return False
+        blockers = everything
+        cannon_target = not bit & (bitboards[CANNON] | bitboards[8 | CANNON])
+
+    # soldiers and guards move one step, but guards have no palace
+    # destinations
+    if _step_attacker(bitboards, color << 3 | SOLDIER, bit) is not None:
+        return True
+    if not palace and \
+            _step_attacker(bitboards, color << 3 | GUARD, bit) is not None:
+        return True
+
+    # horses and elephants are blocked by any piece on their legs
+    for code in (color << 3 | HORSE, color << 3 | ELEPHANT):
+        if _leg_attacker(bitboards, code, square, blockers) is not None:
+            return True
+
+    chariot_bit, cannon_bit = _ray_attackers(bitboards, occupied, square,
+                                             color, blockers, cannon_target)
+    return bool(chariot_bit or cannon_bit)
+
+
+def least_valuable_attacker(bitboards, occupied, square, color):
+    """
+    Finds the least valuable piece (see EXCHANGE_VALUES) of a color that can
+    capture on a square, following the same rules as is_attacked, except that
+    the general is included as the most valuable attacker.
+
+    Parameters: bitboards and occupied are lists of bitboards by piece code
+        and by color (see Board), square is the square (int), and color is the
+        color (int RED or BLUE) of the attacking pieces.
+    Returns: the square (int) of the attacking piece, or None if there isn't
+        one
+    """
+    bit = BITS[square]
+    if bit & occupied[color]:
+        return None
+    everything = occupied[RED] | occupied[BLUE]
+
+    for code in (color << 3 | SOLDIER, color << 3 | GUARD):
+        attacker = _step_attacker(bitboards, code, bit)
+        if attacker is not None:
+            return attacker
+    for code in (color << 3 | ELEPHANT, color << 3 | HORSE):
+        attacker = _leg_attacker(bitboards, code, square, everything)
+        if attacker is not None:
+            return attacker
+
+    chariot_bit, cannon_bit = _ray_attackers(
+        bitboards, occupied, square, color, everything,
+        not bit & (bitboards[CANNON] | bitboards[8 | CANNON]))
+    if cannon_bit:
+        return cannon_bit.bit_length() - 1
+    if chariot_bit:
+        return chariot_bit.bit_length() - 1
+    return _step_attacker(bitboards, color << 3 | GENERAL, bit)
+
+
+def static_exchange(squares, bitboards, occupied, from_square, to_square):
+    """
+    Finds the outcome of the sequence of captures on a square that starts with
+    a piece capturing there, where each side then recaptures with its least
+    valuable attacker (see least_valuable_attacker) and may stop capturing
+    when that is better for it. Pieces that are taken off the square's rays
+    uncover the chariots and cannons behind them, and can remove or become the
+    screens of cannons. The captures are made on copies of the board's lists,
+    so the board doesn't change.
+
+    Parameters: squares, bitboards, and occupied are the Board's bytearray of
+        piece codes and lists of bitboards (see Board), from_square is the
+        square (int) of the piece that captures first, and to_square is the
+        square (int) it captures on.
+    Returns: the material (int, see EXCHANGE_VALUES) won by the player who
+        captures first, which is negative if the exchange loses material
+    """
+    squares = bytearray(squares)
+    bitboards = list(bitboards)
+    occupied = list(occupied)
+    to_bit = BITS[to_square]
+
+    gains = []
+    gain = 0
+    square = from_square
+    while square is not None:
+        code = squares[square]
+        captured_code = squares[to_square]
+        gain = EXCHANGE_VALUES[captured_code & TYPE_MASK] - gain
+        gains.append(gain)
+        if captured_code & TYPE_MASK == GENERAL:
+            break
+
+        # make the capture on the copies
+        bitboards[captured_code] ^= to_bit
+        occupied[captured_code >> 3] ^= to_bit
+        move_bits = BITS[square] | to_bit
+        bitboards[code] ^= move_bits
+        occupied[code >> 3] ^= move_bits
+        squares[to_square] = code
+        squares[square] = EMPTY
+
+        square = least_valuable_attacker(bitboards, occupied, to_square,
+                                         1 - (code >> 3))
+
+    # each player can stop instead of capturing again, so work back from
+    # the last capture (the first capture is always made)
+    for index in range(len(gains) - 1, 0, -1):
+        gains[index - 1] = -max(-gains[index - 1], gains[index])
+    return gains[0]
+
+
+class MoveStatus(Enum):
+    """
+    The outcome of an attempted move (see JanggiGame.try_move). MOVED and
+    PASSED are legal moves. The value of each other status is the message
+    explaining why the move was not allowed.
+    """
+    MOVED = 'The piece was moved.'
+    PASSED = 'The turn was passed.'
+    NO_POSITION = 'No position specified'
+    INVALID_POSITION = 'Invalid board position'
+    GAME_FINISHED = 'The game is already finished.'
+    PASS_IN_CHECK = 'Player is in check. Passing is not allowed.'
+    EMPTY_POSITION = 'The position to move from is empty.'
+    OPPONENTS_PIECE = 'The piece belongs to the other player.'
+    GENERAL_CANT_MOVE = "The general can't move to that position."
+    PIECE_CANT_MOVE = "The piece can't move to that position."
+    SELF_CHECK = ('The move is not allowed because it puts or leaves the '
+                  'player in check.')
+
+
+class MoveResult:
+    """
+    Represents the result of an attempted move, returned by
+    JanggiGame.try_move so that callers don't need to read the messages.
+
+    Data members: See __init__
+    Methods: get_status, get_captured_piece_id, is_legal, is_check,
+        get_game_state
+    """
+    __slots__ = ('_status', '_captured_piece_id', '_check', '_game_state')
+
+    def __init__(self, status, captured_piece_id=None, check=False,
+                 game_state='UNFINISHED'):
+        """
+        Creates a MoveResult. The parameters are set as private data members
+        as follows:
+            status: MoveStatus of the move
+            captured_piece_id: (str) piece_id of the captured piece, or None if
+                no piece was captured
+            check: (bool) True if the move put the other player in check
+            game_state: (str) the game state after the move (see
+                JanggiGame.get_game_state)
+        """
+        self._status = status
+        self._captured_piece_id = captured_piece_id
+        self._check = check
+        self._game_state = game_state
+
+    def get_status(self):
+        """Returns the MoveStatus of the move"""
+        return self._status
+
+    def get_captured_piece_id(self):
+        """Returns the piece_id (str) of the captured piece, or None"""
+        return self._captured_piece_id
+
+    def is_legal(self):
+        """Returns True if the move was made or the turn was passed, otherwise
+        False"""
+        return self._status is MoveStatus.MOVED or \
+            self._status is MoveStatus.PASSED
+
+    def is_check(self):
+        """Returns True if the move put the other player in check, otherwise
+        False"""
+        return self._check
+
+    def get_game_state(self):
+        """Returns the game state (str) after the move"""
+        return self._game_state
+
+
+class PositionCache:
+    """
+    Represents a cache of the legal moves and check status of positions, keyed
+    by their Zobrist hash (see JanggiGame.canonical_hash). Caching is opt-in:
+    a PositionCache is given to one or more games with
+    JanggiGame.set_position_cache, and the games then look up the positions
+    they reach before finding their legal moves. The cache has a budget of
+    bytes, and when the estimated size of the entries is over the budget, the
+    least recently used entries are removed.
+
+    Data members: See __init__
+    Methods: get, peek, put, clear, get_hits, get_misses, get_num_bytes,
+        get_max_bytes, __len__, _entry_bytes
+    """
+    __slots__ = ('_entries', '_max_bytes', '_num_bytes', '_hits', '_misses')
+
+    # estimated bytes of the OrderedDict's bookkeeping for each entry
+    ENTRY_OVERHEAD = 104
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        Creates a PositionCache. Optionally takes the budget of bytes (int).
+        Private data members:
+            entries: OrderedDict with position hashes (int) as keys and tuples
+                (legal moves array, in check) as values, from least to most
+                recently used. The legal moves are encoded (see encode_move),
+                and in check (bool) is True if the player whose turn it is is
+                in check.
+            max_bytes: (int) the budget of bytes for the entries
+            num_bytes: (int) the estimated bytes of the entries
+            hits: (int) the number of lookups that found an entry
+            misses: (int) the number of lookups that didn't find an entry
+        """
+        self._entries = OrderedDict()
+        self._max_bytes = max_bytes
+        self._num_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        """Returns the number of entries (int)"""
+        return len(self._entries)
+
+    def get_hits(self):
+        """Returns the number of lookups that found an entry (int)"""
+        return self._hits
+
+    def get_misses(self):
+        """Returns the number of lookups that didn't find an entry (int)"""
+        return self._misses
+
+    def get_num_bytes(self):
+        """Returns the estimated bytes of the entries (int)"""
+        return self._num_bytes
+
+    def get_max_bytes(self):
+        """Returns the budget of bytes for the entries (int)"""
+        return self._max_bytes
+
+    def get(self, position_hash):
+        """Takes a position hash (int) and returns its entry, a tuple
+        (legal moves array, in check), or None if it isn't cached. The entry
+        becomes the most recently used."""
+        entry = self._entries.get(position_hash)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(position_hash)
+        return entry
+
+    def peek(self, position_hash):
+        """Takes a position hash (int) and returns its entry like get, or
+        None, but without counting the lookup or changing which entries were
+        most recently used. This is for reading the in check flag, which is
+        cheap to compute when the position isn't cached."""
+        return self._entries.get(position_hash)
+
+    def put(self, position_hash, legal_moves, in_check):
+        """Takes a position hash (int), an array of the position's encoded
+        legal moves, and whether the player whose turn it is is in check
+        (bool), and adds them as the most recently used entry. Removes the
+        least recently used entries while the cache is over its budget."""
+        entries = self._entries
+        if position_hash in entries:
+            self._num_bytes -= self._entry_bytes(position_hash,
+                                                 entries.pop(position_hash))
+
+        entry = (legal_moves, in_check)
+        entries[position_hash] = entry
+        self._num_bytes += self._entry_bytes(position_hash, entry)
+
+        while self._num_bytes > self._max_bytes and entries:
+            old_hash, old_entry = entries.popitem(last=False)
+            self._num_bytes -= self._entry_bytes(old_hash, old_entry)
+
+    def clear(self):
+        """Removes all of the entries and resets the hit and miss
+        counters"""
+        self._entries.clear()
+        self._num_bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def _entry_bytes(self, position_hash, entry):
+        """Takes a position hash (int) and its entry and returns the
+        estimated bytes (int) that they use in the cache"""
+        return sys.getsizeof(position_hash) + sys.getsizeof(entry) + \
+            sys.getsizeof(entry[0]) + self.ENTRY_OVERHEAD
+
+
+class TranspositionTable:
+    """
+    Represents a fixed-size table of the scores of positions that have been
+    searched (see JanggiGame.search), indexed by their Zobrist hash (see
+    JanggiGame.position_hash) modulo the size. Each slot holds at most one
+    entry, so the memory used is bounded, and a new entry replaces the old
+    one unless the old one is for the same position and was searched deeper.
+    A table can be passed to several searches so that they reuse the scores.
+
+    Data members: See __init__
+    Methods: probe, store, clear, get_size
+    """
+    __slots__ = ('_entries', '_size')
+
+    def __init__(self, size=1 << 16):
+        """
+        Creates a TranspositionTable with the number of entries (int) given
+        by size.
+        Private data members:
+            entries: list of size entries, which are None or tuples of
+                (position hash, depth, score, bound, encoded move), where the
+                bound is EXACT_BOUND, LOWER_BOUND, or UPPER_BOUND, and the move
+                is the best move found or None. Checkmate scores are counted
+                from the position, not the root (see score_to_table).
+            size: (int) the number of entries
+        """
+        self._entries = [None] * size
+        self._size = size
+
+    def probe(self, position_hash):
+        """Takes a position hash (int) and returns its entry (tuple, see
+        __init__), or None if the position isn't in the table"""
+        entry = self._entries[position_hash % self._size]
+        if entry is not None and entry[0] == position_hash:
+            return entry
+        return None
+
+    def store(self, position_hash, depth, score, bound, move):
+        """Takes a position hash (int), the depth (int) it was searched to,
+        its score (int), the bound of the score, and the best move (int or
+        None), and stores them in the position's slot"""
+        index = position_hash % self._size
+        entry = self._entries[index]
+        if entry is None or entry[0] != position_hash or entry[1] <= depth:
+            self._entries[index] = (position_hash, depth, score, bound, move)
+
+    def clear(self):
+        """Removes all of the entries"""
+        self._entries = [None] * self._size
+
+    def get_size(self):
+        """Returns the number of entries (int) the table can hold"""
+        return self._size
+
+
+class SearchResult:
+    """
+    Represents the result of a search for the best move, returned by
+    JanggiGame.search, with the statistics of the search.
+
+    Data members: See __init__
+    Methods: get_move, get_encoded_move, get_score, get_depth, get_nodes,
+        get_seconds, get_nodes_per_second
+    """
+    __slots__ = ('_move', '_score', '_depth', '_nodes', '_seconds')
+
+    def __init__(self, move, score, depth, nodes, seconds):
+        """
+        Creates a SearchResult. The parameters are set as private data members
+        as follows:
+            move: (int) the best move found, encoded (see encode_move), or
+                None if the player has no move
+            score: (int) the score of the move for the player whose turn it is,
+                in tenths of a point (see JanggiGame.evaluate), or near
+                MATE_SCORE for a checkmate
+            depth: (int) the depth of the last search that was completed
+            nodes: (int) the number of positions searched
+            seconds: (float) the time the search took
+        """
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._seconds = seconds
+
+    def get_move(self):
+        """Returns the best move as a tuple of positions (str) that can be
+        passed to JanggiGame.make_move, or None if there is no move"""
+        if self._move is None:
+            return None
+        return decode_move(self._move)
+
+    def get_encoded_move(self):
+        """Returns the best move encoded as an int, or None"""
+        return self._move
+
+    def get_score(self):
+        """Returns the score (int) of the best move"""
+        return self._score
+
+    def get_depth(self):
+        """Returns the depth (int) of the last completed search"""
+        return self._depth
+
+    def get_nodes(self):
+        """Returns the number of positions (int) searched"""
+        return self._nodes
+
+    def get_seconds(self):
+        """Returns the time (float) the search took in seconds"""
+        return self._seconds
+
+    def get_nodes_per_second(self):
+        """Returns the number of positions searched per second (float)"""
+        if not self._seconds:
+            return 0.0
+        return self._nodes / self._seconds
+
+
+class MateStatus(Enum):
+    """
+    The outcome of a search for a forced checkmate (see JanggiGame.find_mate):
+    the checkmate was proven, it was disproven, or the search ran out of
+    nodes first.
+    """
+    PROVEN = 'proven'
+    DISPROVEN = 'disproven'
+    UNKNOWN = 'unknown'
+
+
+class MateResult:
+    """
+    Represents the result of a search for a forced checkmate, returned by
+    JanggiGame.find_mate.
+
+    Data members: See __init__
+    Methods: get_status, is_proven, get_move, get_line, get_nodes, get_seconds
+    """
+    __slots__ = ('_status', '_line', '_nodes', '_seconds')
+
+    def __init__(self, status, line, nodes, seconds):
+        """
+        Creates a MateResult. The parameters are set as private data members
+        as follows:
+            status: MateStatus of the search
+            line: list of the encoded moves (int, see encode_move) of a forced
+                checkmate if it was proven, otherwise an empty list
+            nodes: (int) the number of positions in the proof tree
+            seconds: (float) the time the search took
+        """
+        self._status = status
+        self._line = line
+        self._nodes = nodes
+        self._seconds = seconds
+
+    def get_status(self):
+        """Returns the MateStatus of the search"""
+        return self._status
+
+    def is_proven(self):
+        """Returns True if a forced checkmate was proven, otherwise False"""
+        return self._status is MateStatus.PROVEN
+
+    def get_move(self):
+        """Returns the first move of the checkmate as a tuple of positions
+        (str) that can be passed to JanggiGame.make_move, or None if no
+        checkmate was proven"""
+        if not self._line:
+            return None
+        return decode_move(self._line[0])
+
+    def get_line(self):
+        """Returns a list of the moves of the checkmate, alternating between
+        the attacker and the defender, as tuples of positions (str)"""
+        return [decode_move(move) for move in self._line]
+
+    def get_nodes(self):
+        """Returns the number of positions (int) in the proof tree"""
+        return self._nodes
+
+    def get_seconds(self):
+        """Returns the time (float) the search took in seconds"""
+        return self._seconds
+
+
+class _ProofNode:
+    """A position in the proof tree of JanggiGame.find_mate: the move
+    (int) that reached it, its parent _ProofNode, its children (None until it
+    is expanded), its proof and disproof numbers (int), whether the attacker
+    is to move (an OR node), and the number of moves (int) the attacker has
+    left."""
+    __slots__ = ('move', 'parent', 'children', 'proof', 'disproof',
+                 'attacker_to_move', 'moves_left')
+
+    def __init__(self, move, parent, attacker_to_move, moves_left):
+        self.move = move
+        self.parent = parent
+        self.children = None
+        self.proof = 1
+        self.disproof = 1
+        self.attacker_to_move = attacker_to_move
+        self.moves_left = moves_left
+
+    def update(self):
+        """Sets the proof and disproof numbers from the children's: an OR
+        node needs one child proven and all disproven, and an AND node needs
+        all children proven and one disproven."""
+        children = self.children
+        if self.attacker_to_move:
+            self.proof = min(child.proof for child in children)
+            self.disproof = min(sum(child.disproof for child in children),
+                                PROOF_INFINITY)
+        else:
+            self.proof = min(sum(child.proof for child in children),
+                             PROOF_INFINITY)
+            self.disproof = min(child.disproof for child in children)
+
+
+class _SearchTimeout(Exception):
+    """Raised inside a search when its deadline has passed"""
+
+
+class _Search:
+    """Holds the state shared by the nodes of one search: the transposition
+    table, the deadline (perf_counter time, or None), and the number of nodes
+    searched."""
+    __slots__ = ('table', 'deadline', 'nodes')
+
+    def __init__(self, table, deadline):
+        self.table = table
+        self.deadline = deadline
+        self.nodes = 0
+
+
+def _rollout(job):
+    """Takes a tuple (position, piece_square_tables, seed, max_plies), where
+    the position is from JanggiGame.export_position and the piece-square
+    tables are the game's (see JanggiGame.set_piece_square_tables), or None
+    for the default ones. Plays random legal moves from the position for up
+    to max_plies moves, and returns the color index (RED or BLUE) of the
+    winner, or None for a draw. If neither player is checkmated, the player
+    with the better evaluation (see JanggiGame.evaluate) wins. This runs in
+    the processes of a MonteCarloTreeSearch's pool, so the job is kept
+    small."""
+    position, piece_square_tables, seed, max_plies = job
+    rng = random.Random(seed)
+    game = JanggiGame(message_handler=None)
+    if piece_square_tables is not None:
+        game.set_piece_square_tables(piece_square_tables)
+    game.load_position(position)
+
+    for _ in range(max_plies):
+        moves = game.encoded_legal_moves()
+        if not moves:
+            if game.is_in_check(game.get_turn()):
+                return 1 - COLOR_INDEX[game.get_turn()]  # checkmate
+            moves.append(PASS_MOVE)
+        game.push_encoded_move(rng.choice(moves))
+
+    score = game.evaluate()
+    if not score:
+        return None
+    if score > 0:
+        return COLOR_INDEX[game.get_turn()]
+    return 1 - COLOR_INDEX[game.get_turn()]
+
+
+class _MCTSNode:
+    """A position in the tree of a MonteCarloTreeSearch: the move (int) that
+    reached it, its parent _MCTSNode, its children (None until it is
+    expanded), the number of playouts through it, the wins (float, draws
+    count as half) of the player who made the move in those playouts, and
+    that player's color index."""
+    __slots__ = ('move', 'parent', 'children', 'visits', 'wins', 'color')
+
+    def __init__(self, move, parent, color):
+        self.move = move
+        self.parent = parent
+        self.children = None
+        self.visits = 0
+        self.wins = 0.0
+        self.color = color
+
+
+class MonteCarloTreeSearch:
+    """
+    Represents a Monte Carlo tree search (UCT) player that chooses moves for
+    JanggiGame positions. The tree is built in the calling process with
+    push_encoded_move and pop_move, so the rules are the same as for
+    make_move, and the random rollouts from its leaves run in parallel on a
+    multiprocessing pool. The positions are sent to the pool with
+    JanggiGame.export_position, which is much smaller than a pickled game,
+    along with the game's piece-square tables so that the rollouts are scored
+    like JanggiGame.evaluate.
+    Each batch of leaves is selected with a virtual loss, so that the
+    processes roll out different parts of the tree, and the results are
+    merged back into the tree before the next batch.
+
+    Data members: See __init__
+    Methods: choose_move, get_playouts, get_seconds, close, _get_pool,
+        _run_rollouts, _select_leaf, _backpropagate
+    """
+    __slots__ = ('_processes', '_exploration', '_rollout_plies', '_rng',
+                 '_pool', '_playouts', '_seconds')
+
+    def __init__(self, processes=None, exploration=UCT_EXPLORATION,
+                 rollout_plies=ROLLOUT_PLIES, seed=None):
+        """
+        Creates a MonteCarloTreeSearch. The parameters are set as private data
+        members as follows:
+            processes: (int) number of processes for the rollouts, or None for
+                one per CPU. With 1 the rollouts run in the calling process.
+            exploration: (float) the UCT exploration constant
+            rollout_plies: (int) the number of random moves in a rollout
+            rng: random.Random seeded with seed, which chooses the seeds of
+                the rollouts
+        Other private data members:
+            pool: multiprocessing Pool, or None until it is needed
+            playouts: (int) the number of playouts of the last choose_move
+            seconds: (float) the time the last choose_move took
+        """
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self._processes = processes
+        self._exploration = exploration
+        self._rollout_plies = rollout_plies
+        self._rng = random.Random(seed)
+        self._pool = None
+        self._playouts = 0
+        self._seconds = 0.0
+
+    def choose_move(self, game, playouts=None, time_limit=None):
+        """
+        Takes a JanggiGame and searches for the best move of the player whose
+        turn it is with up to playouts (int) playouts, or until time_limit
+        (float) seconds have passed, or both (DEFAULT_PLAYOUTS if neither is
+        given). Returns the move with the most playouts as a tuple of
+        positions (str) that can be passed to make_move, or None if the game
+        is finished. The game is left in the same position.
+        """
+        start = time.perf_counter()
+        if playouts is None and time_limit is None:
+            playouts = DEFAULT_PLAYOUTS
+        deadline = None if time_limit is None else start + time_limit
+        root = _MCTSNode(None, None, 1 - COLOR_INDEX[game.get_turn()])
+        piece_square_tables = game.get_piece_square_tables()
+        if piece_square_tables is DEFAULT_PIECE_SQUARE_TABLES:
+            piece_square_tables = None  # the processes have the default
+        batch_size = max(1, self._processes) * ROLLOUTS_PER_PROCESS
+        num_playouts = 0
+
+        if game.get_game_state() == 'UNFINISHED':
+            while (playouts is None or num_playouts < playouts) and \
+                    (deadline is None or time.perf_counter() < deadline):
+                if playouts is not None:
+                    batch_size = min(batch_size, playouts - num_playouts)
+
+                # select the leaves, and find the winners of those that are
+                # checkmates without rolling them out
+                leaves = []
+                jobs = []
+                for _ in range(batch_size):
+                    node, position = self._select_leaf(game, root)
+                    if position is None:
+                        leaves.append((node, node.color))
+                    else:
+                        leaves.append((node, None))
+                        jobs.append((position, piece_square_tables,
+                                     self._rng.getrandbits(32),
+                                     self._rollout_plies))
+                    if root.children == []:
+                        break
+
+                winners = iter(self._run_rollouts(jobs))
+                for node, winner in leaves:
+                    if winner is None:
+                        winner = next(winners)
+                    self._backpropagate(node, winner)
+                num_playouts += len(leaves)
+                if root.children == []:
+                    break
+
+        self._playouts = num_playouts
+        self._seconds = time.perf_counter() - start
+        if not root.children:
+            return None
+        return decode_move(max(root.children,
+                               key=lambda child: child.visits).move)
+
+    def get_playouts(self):
+        """Returns the number of playouts (int) of the last choose_move"""
+        return self._playouts
+
+    def get_seconds(self):
+        """Returns the time (float) the last choose_move took in seconds"""
+        return self._seconds
+
+    def close(self):
+        """Closes the pool of processes, if there is one"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _get_pool(self):
+        """Returns the multiprocessing Pool, which is created the first time
+        it is needed"""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._processes)
+        return self._pool
+
+    def _run_rollouts(self, jobs):
+        """Takes a list of rollout jobs (see _rollout) and returns a list of
+        their winners, in the same order"""
+        if not jobs:
+            return []
+        if self._processes <= 1:
+            return [_rollout(job) for job in jobs]
+        return self._get_pool().map(_rollout, jobs)
+
+    def _select_leaf(self, game, root):
+        """
+        Takes a JanggiGame and the root _MCTSNode for its position, follows
+        the children with the highest UCT values from the root, expands the
+        node it reaches, and moves to one of the new children. Adds a virtual
+        loss (a visit without a win) to the nodes on the path, takes the moves
+        back, and returns a tuple of the leaf node and its position (see
+        JanggiGame.export_position), or None for the position if the leaf
+        is a checkmate.
+        """
+        exploration = self._exploration
+        node = root
+        num_moves = 0
+        while node.children:
+            log_visits = math.log(node.visits)
+            best_value = -1.0
+            for child in node.children:
+                if not child.visits:
+                    best_child = child
+                    break
+                value = child.wins / child.visits + \
+                    exploration * math.sqrt(log_visits / child.visits)
+                if value > best_value:
+                    best_value = value
+                    best_child = child
+            node = best_child
+            game.push_encoded_move(node.move)
+            num_moves += 1
+
+        # expand the node, unless it is a checkmate. When the player can't
+        # move but isn't in check, they pass.
+        if node.children is None:
+            moves = game.encoded_legal_moves()
+            if not moves and not game.is_in_check(game.get_turn()):
+                moves.append(PASS_MOVE)
+            color = COLOR_INDEX[game.get_turn()]
+            node.children = [_MCTSNode(move, node, color) for move in moves]
+            if node.children:
+                node = self._rng.choice(node.children)
+                game.push_encoded_move(node.move)
+                num_moves += 1
+
+        position = None if node.children == [] else game.export_position()
+        for _ in range(num_moves):
+            game.pop_move()
+
+        leaf = node
+        while node is not None:
+            node.visits += 1
+            node = node.parent
+        return leaf, position
+
+    def _backpropagate(self, node, winner):
+        """Takes a leaf _MCTSNode and the color index of the winner of its
+        playout, or None for a draw, and adds the win to the nodes from the
+        leaf to the root (their visits were added by _select_leaf)."""
+        while node is not None:
+            if winner is None:
+                node.wins += 0.5
+            elif node.color == winner:
+                node.wins += 1.0
+            node = node.parent
+
+
+# the game in the starting position that new games are copied from, which is
+# created after the classes are defined (see below)
+_INITIAL_GAME = None
+
+
 class JanggiGame:
     """
     An implementation of the board game Janggi. Has two Player objects and
@@ -21,30 +1659,142 @@ class JanggiGame:
     General objects because it needs to pass information from the opposing
     Player to the General.
 
+    Moves can be made and taken back without validation with push_move and
+    pop_move, which keep the changes each move made on a stack so that any
+    number of moves can be taken back.
+    New games copy the starting position from a game that is created once when
+    the module is imported (_INITIAL_GAME), and a game in progress can be
+    copied with clone.
+
     Data members: See __init__
-    Methods: get_game_state, set_game_state, get_turn, get_num_turns, next_turn,
-        get_board, get_red_player, get_blue_player, get_current_player,
-        get_opponent, is_in_check, is_checkmate, make_move, undo_move,
-        update_generals
+    Methods: get_game_state, set_game_state, get_turn, get_num_turns,
+        next_turn, get_board, get_red_player, get_blue_player,
+        get_current_player, get_opponent, get_move_stack, get_message_handler,
+        set_message_handler, is_in_check, is_square_attacked, is_checkmate,
+        is_stalemate, has_legal_move, legal_moves, encoded_legal_moves,
+        legal_moves_from, export_position, load_position, position_hash,
+        mirror_position_hash, canonical_hash, is_mirrored, canonical_move,
+        get_position_cache, set_position_cache, get_repetition_count,
+        get_repetition_limit, set_repetition_limit, get_move_limit,
+        set_move_limit, is_draw, evasion_moves, pin_mask, make_move, try_move,
+        undo_move, push_move, push_encoded_move, pop_move, evaluate,
+        get_piece_square_tables, set_piece_square_tables, exchange_value, see,
+        best_move, search, checking_moves, find_mate, update_generals,
+        get_debug_mode, set_debug_mode, clone, _copy_to, _log, _is_checkmated,
+        _checking_masks, _evasion_mask, _iter_legal_moves, _find_legal_moves,
+        _count_position, _end_if_draw, _evaluation, _order_moves,
+        _search_moves, _negamax, _expand_proof_node, _update_after_move,
+        _verify_update
     """
-    def __init__(self):
+    __slots__ = ('_game_state', '_turn', '_num_turns', '_board', '_red_player',
+                 '_blue_player', '_debug_mode', '_move_stack',
+                 '_message_handler', '_position_cache', '_position_counts',
+                 '_repetition_limit', '_move_limit', '_piece_square_tables')
+
+    def __init__(self, message_handler=print, repetition_limit=None,
+                 move_limit=None):
         """
-        Creates a JanggiGame.
+        Creates a JanggiGame. Optionally takes a message_handler,
+        repetition_limit, and move_limit (see below).
+        The board, players, and pieces are copied from _INITIAL_GAME, once it
+        has been created, instead of being initialized again.
         Private data members:
-            game_state: (str) 'UNFINISHED', 'RED_WON', or 'BLUE_WON'
+            game_state: (str) 'UNFINISHED', 'RED_WON', 'BLUE_WON', or 'DRAW'
             turn: represents whose turn it is, (str) 'red' or 'blue'
             num_turns: the number of turns that have been played (int)
             board: Board object
             red_player: Player object
             blue_player: Player object
+            debug_mode: (bool) if True, the pieces that are updated after each
+                move are checked against updating all of the pieces
+            move_stack: list with a tuple for each move made with push_move
+                that hasn't been taken back, with everything pop_move needs to
+                restore the game to how it was before the move (see push_move)
+            message_handler: function that is called with each message (str)
+                about the moves, such as why a move is not allowed, or None to
+                make moves without any messages. The default is print.
+            position_cache: PositionCache of the legal moves of the positions
+                that have been reached, or None if they aren't cached
+            position_counts: dictionary with position hashes (int, see
+                position_hash) as keys and the number of times (int) the
+                position has been reached in the moves on the move stack,
+                including the starting position, as values
+            repetition_limit: (int) the game is a draw when a move reaches
+                a position for this many times (e.g., 3 for threefold
+                repetition), or None if repetition doesn't end the game
+            move_limit: (int) the game is a draw when this many turns have been
+                played without a winner, or None if there is no limit
+            piece_square_tables: the piece-square tables of the bonuses used by
+                evaluate (see set_piece_square_tables), which start as
+                DEFAULT_PIECE_SQUARE_TABLES
         """
+        self._debug_mode = False
+        self._message_handler = message_handler
+        self._position_cache = None
+        self._repetition_limit = repetition_limit
+        self._move_limit = move_limit
+
+        if _INITIAL_GAME is not None:
+            _INITIAL_GAME._copy_to(self)
+            return
+
         self._game_state = 'UNFINISHED'
         self._turn = 'blue'
         self._num_turns = 0
         self._board = Board()
+        self._piece_square_tables = DEFAULT_PIECE_SQUARE_TABLES
         self._red_player = Player('red', self._board)
         self._blue_player = Player('blue', self._board)
+        self._move_stack = []
         self.update_generals()  # initialize general's allowed moves
+        self._position_counts = {self.position_hash(): 1}
+
+    def clone(self):
+        """Returns a new JanggiGame with a copy of the game's state, including
+        its move stack, so that either game can make and take back moves
+        without changing the other. Only the mutable state is copied: the
+        moves that were already computed and the tables are shared."""
+        game = JanggiGame.__new__(JanggiGame)
+        game._debug_mode = self._debug_mode
+        game._message_handler = self._message_handler
+        game._position_cache = self._position_cache
+        game._repetition_limit = self._repetition_limit
+        game._move_limit = self._move_limit
+        self._copy_to(game)
+        return game
+
+    def _copy_to(self, game):
+        """Takes a JanggiGame object and copies the game state, turn, board,
+        players, pieces, and move stack to it (see clone)."""
+        game._game_state = self._game_state
+        game._turn = self._turn
+        game._num_turns = self._num_turns
+        game._piece_square_tables = self._piece_square_tables
+        board = self._board.clone()
+        game._board = board
+        game._red_player = self._red_player.clone(board)
+        game._blue_player = self._blue_player.clone(board)
+
+        # the moves on the stack refer to the copied pieces, and the pieces
+        # that have been captured are copied too
+        copies = {}
+        for player, player_copy in ((self._red_player, game._red_player),
+                                    (self._blue_player, game._blue_player)):
+            for piece_id, piece in player.get_pieces().items():
+                copies[id(piece)] = player_copy.get_pieces()[piece_id]
+        move_stack = []
+        for move in self._move_stack:
+            moved_pieces = []
+            for piece in move[0], move[3]:
+                if piece is not None:
+                    if id(piece) not in copies:
+                        copies[id(piece)] = piece.clone(board)
+                    piece = copies[id(piece)]
+                moved_pieces.append(piece)
+            move_stack.append((moved_pieces[0], move[1], move[2],
+                               moved_pieces[1]) + move[4:])
+        game._move_stack = move_stack
+        game._position_counts = dict(self._position_counts)
 
     def get_turn(self):
         """Returns the turn (str), which may be 'blue' or 'red' depending on
@@ -55,6 +1805,61 @@ class JanggiGame:
         """Returns the number of turns that have been played (int)"""
         return self._num_turns
 
+    def export_position(self):
+        """Returns the position as a compact tuple that can be pickled, e.g.,
+        to send it to another process: (bytes of the piece codes of the
+        squares, the turn (str), the number of turns (int)). It is much
+        smaller than a pickled game, which includes its pieces and move stack.
+        The piece-square tables aren't included (see
+        get_piece_square_tables)."""
+        return bytes(self._board.get_squares()), self._turn, self._num_turns
+
+    def load_position(self, position):
+        """
+        Takes a position from export_position and sets up the game with it:
+        the board, the players, and their pieces, with the turn and the
+        number of turns. The pieces get new piece_ids, numbered in the order
+        of their squares. The move stack and position counts start over, and
+        the game is unfinished.
+        """
+        squares, turn, num_turns = position
+        type_names = {piece_type: name for name, piece_type
+                      in PIECE_TYPES.items()}
+        board = Board()
+        for square in range(NUM_SQUARES):
+            board.clear_square(square)
+        if self._piece_square_tables is not DEFAULT_PIECE_SQUARE_TABLES:
+            board.set_square_values(
+                build_square_values(self._piece_square_tables))
+        red_player = Player('red', board)
+        blue_player = Player('blue', board)
+        players = (red_player, blue_player)
+        for player in players:
+            player.get_pieces().clear()
+
+        piece_numbers = {}
+        for square, code in enumerate(squares):
+            if not code:
+                continue
+            prefix = COLOR_NAMES[code >> 3][0] + type_names[code & TYPE_MASK]
+            piece_numbers[prefix] = piece_numbers.get(prefix, 0) + 1
+            piece_id = prefix + str(piece_numbers[prefix])
+            board.set_square(square, piece_id)
+            if code & TYPE_MASK == GENERAL:
+                board.set_general_position(COLOR_NAMES[code >> 3],
+                                           SQUARE_NAMES[square])
+            players[code >> 3].add_piece(piece_id, SQUARE_NAMES[square])
+
+        self._game_state = 'UNFINISHED'
+        self._turn = turn
+        self._num_turns = num_turns
+        self._board = board
+        self._red_player = red_player
+        self._blue_player = blue_player
+        self._move_stack = []
+        self.update_generals()
+        self._position_counts = {self.position_hash(): 1}
+
     def next_turn(self):
         """If the turn is 'blue', sets the turn to 'red' (str), and vice
         versa."""
@@ -71,6 +1876,112 @@ class JanggiGame:
         """Returns the board object."""
         return self._board
 
+    def get_position_cache(self):
+        """Returns the PositionCache, or None if positions aren't cached"""
+        return self._position_cache
+
+    def set_position_cache(self, position_cache):
+        """Takes a PositionCache, which may be shared with other games, to
+        look up the legal moves of the positions that the game reaches, or None
+        to stop caching them"""
+        self._position_cache = position_cache
+
+    def get_repetition_count(self):
+        """Returns the number of times (int) the current position has been
+        reached, including now"""
+        return self._position_counts.get(self.position_hash(), 0)
+
+    def get_repetition_limit(self):
+        """Returns the number of times (int) a position can be reached before
+        the game is a draw, or None if there is no limit"""
+        return self._repetition_limit
+
+    def set_repetition_limit(self, repetition_limit):
+        """Sets the number of times (int) a position can be reached before the
+        game is a draw (e.g., 3 for threefold repetition), or None for no
+        limit"""
+        self._repetition_limit = repetition_limit
+
+    def get_move_limit(self):
+        """Returns the number of turns (int) after which the game is a draw,
+        or None if there is no limit"""
+        return self._move_limit
+
+    def set_move_limit(self, move_limit):
+        """Sets the number of turns (int) after which the game is a draw, or
+        None for no limit"""
+        self._move_limit = move_limit
+
+    def is_draw(self):
+        """Returns True if the current position has been reached as many
+        times as the repetition_limit, or as many turns as the move_limit
+        have been played, otherwise False"""
+        repetition_limit = self._repetition_limit
+        if repetition_limit is not None and \
+                self.get_repetition_count() >= repetition_limit:
+            return True
+        move_limit = self._move_limit
+        return move_limit is not None and self._num_turns >= move_limit
+
+    def _count_position(self, count):
+        """Takes 1 or -1 (int) and adds it to the number of times the current
+        position has been reached"""
+        position_counts = self._position_counts
+        position_hash = self.position_hash()
+        position_count = position_counts.get(position_hash, 0) + count
+        if position_count:
+            position_counts[position_hash] = position_count
+        else:
+            del position_counts[position_hash]
+
+    def position_hash(self):
+        """Returns the 64-bit Zobrist hash (int) of the position: the pieces
+        on the board and the player whose turn it is. The hash is updated with
+        each change to the board, so this takes constant time."""
+        if self._turn == 'red':
+            return self._board.get_hash() ^ ZOBRIST_RED_TO_MOVE
+        return self._board.get_hash()
+
+    def mirror_position_hash(self):
+        """Returns the Zobrist hash (int) of the position mirrored across the
+        e-file (see MIRROR_SQUARE), i.e., the position_hash that the mirror
+        image of the position would have."""
+        if self._turn == 'red':
+            return self._board.get_mirror_hash() ^ ZOBRIST_RED_TO_MOVE
+        return self._board.get_mirror_hash()
+
+    def canonical_hash(self):
+        """Returns the hash (int) of the canonical form of the position: the
+        smaller of the position_hash and the mirror_position_hash. A position
+        and its mirror image have the same canonical hash, so caches, opening
+        books, etc. keyed by it need only store one of them."""
+        return min(self.position_hash(), self.mirror_position_hash())
+
+    def is_mirrored(self):
+        """Returns True if the canonical form of the position is its mirror
+        image (see canonical_hash), otherwise False."""
+        return self.mirror_position_hash() < self.position_hash()
+
+    def canonical_move(self, move):
+        """Takes an encoded move (int) in the position and returns the move
+        in the canonical form of the position (see canonical_hash), i.e., the
+        mirrored move if the position is mirrored. Since mirroring twice gives
+        back the move, this also converts a move in the canonical form to the
+        move in the position."""
+        if self.is_mirrored():
+            return mirror_move(move)
+        return move
+
+    def get_debug_mode(self):
+        """Returns True if debug mode is on, otherwise False."""
+        return self._debug_mode
+
+    def set_debug_mode(self, debug_mode):
+        """Turns debug mode on or off (bool). In debug mode, the pieces that
+        are updated after each move are checked against updating all of the
+        pieces, which is much slower."""
+        self._debug_mode = debug_mode
+
     def get_red_player(self):
         """Returns the Player object for the red player."""
         return self._red_player
@@ -91,9 +2002,28 @@ class JanggiGame:
             return self.get_blue_player()
         return self.get_red_player()
 
+    def get_move_stack(self):
+        """Returns the list of moves that can be taken back with pop_move"""
+        return self._move_stack
+
+    def get_message_handler(self):
+        """Returns the message handler (function or None)"""
+        return self._message_handler
+
+    def set_message_handler(self, message_handler):
+        """Sets the function that is called with each message (str) about
+        the moves, or None to make moves without any messages"""
+        self._message_handler = message_handler
+
+    def _log(self, message):
+        """Passes the message (str) to the message handler, if there is
+        one"""
+        if self._message_handler is not None:
+            self._message_handler(message)
+
     def get_game_state(self):
-        """Returns game state (str) which may be 'UNFINISHED', 'RED_WON', or
-        BLUE_WON'."""
+        """Returns game state (str) which may be 'UNFINISHED', 'RED_WON',
+        'BLUE_WON', or 'DRAW'."""
         return self._game_state
 
     def set_game_state(self, game_state):
@@ -103,82 +2033,292 @@ class JanggiGame:
     def is_in_check(self, color):
         """Takes a color (str) 'blue' or 'red' and returns True if the
         corresponding player is in check, otherwise False. In check means the
-        general could be captured by the opponent on their next move."""
+        general could be captured by the opponent on their next move. If the
+        player is the one whose turn it is and the position is in the
+        PositionCache, the cached flag is returned."""
+        if self._position_cache is not None and color == self._turn:
+            entry = self._position_cache.peek(self.canonical_hash())
+            if entry is not None:
+                return entry[1]
         if color == 'red':
-            opponent = self.get_blue_player()
-        else:
-            opponent = self.get_red_player()
+            return self.is_square_attacked(
+                self.get_board().get_general_square(RED), 'blue')
+        return self.is_square_attacked(
+            self.get_board().get_general_square(BLUE), 'red')
 
-        if len(opponent.get_pieces_checking()) > 0:
-            return True
-        return False
+    def is_square_attacked(self, square, by_color, palace=False):
+        """
+        Takes a square (int) and a color (str) 'blue' or 'red' and returns True
+        if a piece of that color other than the general could move to the
+        square, otherwise False. The pieces that could reach the square are
+        looked for from the square (see is_attacked), so the pieces' moves
+        don't need to be up to date. If palace is True, the rules for the
+        palace destinations are used, which is how the generals' moves are
+        restricted (see update_generals).
+        """
+        board = self.get_board()
+        return is_attacked(board.get_bitboards(), board.get_occupied(), square,
+                           COLOR_INDEX[by_color], palace)
 
     def is_checkmate(self):
         """
         Returns True if the player whose turn it is has their opponent in
         checkmate (i.e., if the player has won the game), otherwise returns
-        False. Checkmate is when the opponent's general is in check and would
-        not be able to get out of it on their next move because the general has
-        no allowed moves, or there are no moves that can block or capture the
-        piece(s) that has the general in check.
+        False. Checkmate is when the opponent's general is in check and the
+        opponent has no legal move (see has_legal_move), so they would not be
+        able to get out of it on their next move.
         """
-        board = self.get_board()
-        current_player = self.get_current_player()
-        pieces_checking = current_player.get_pieces_checking()
+        return self._is_checkmated(self.get_opponent())
 
-        opponent = self.get_opponent()
-        opponent_color = opponent.get_color()
-        opponent_pieces = opponent.get_pieces()
-        opponent_allowed_destinations = opponent.get_allowed_destinations()
+    def is_stalemate(self):
+        """
+        Returns True if the player whose turn it is isn't in check but has no
+        legal move (see has_legal_move), otherwise returns False. Passing the
+        turn is allowed when the player isn't in check, so the game continues.
+        """
+        return not self.is_in_check(self.get_turn()) and \
+            not self.has_legal_move()
+
+    def _is_checkmated(self, player):
+        """Takes a Player object and returns True if the Player's general
+        is in checkmate, otherwise returns False (see is_checkmate). With a
+        PositionCache, the in check flag and the legal moves are read from the
+        position's entry when it is cached."""
+        if not self.is_in_check(player.get_color()):
+            return False
+        if player is self.get_current_player():
+            return not self.has_legal_move()
+
+        # pass the turn to the player to find their legal moves
+        general_position = self.get_board().get_general_position(
+            player.get_color())
+        game_state = self.get_game_state()
+        self.set_game_state('UNFINISHED')
+        self.push_move(general_position, general_position)
+        checkmated = not self.has_legal_move()
+        self.pop_move()
+        self.set_game_state(game_state)
+        return checkmated
+
+    def has_legal_move(self):
+        """
+        Returns True if the player whose turn it is has at least one legal move
+        (see legal_moves), otherwise returns False. The moves are tried one at
+        a time and the search stops at the first legal move, so this is much
+        cheaper than finding all of the legal moves.
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return False
 
-        if opponent_color == 'red':
-            general = opponent_pieces['rge1']
-        else:
-            general = opponent_pieces['bge1']
+        # with a PositionCache, all of the legal moves are found once and
+        # cached instead
+        if self._position_cache is not None:
+            return len(self.encoded_legal_moves()) > 0
 
-        # if general has an allowed move it can get out of check
-        if len(general.get_allowed_moves()) > 0:
-            return False
+        checking_masks = self._checking_masks()
+        pin_mask = self.pin_mask()
+        for piece in list(self.get_current_player().get_pieces().values()):
+            for _ in self._iter_legal_moves(piece, checking_masks, pin_mask):
+                return True
+        return False
 
-        # check whether only one piece has the general in check
-        if len(pieces_checking) == 1:
-
-            # if the piece can be captured, it's not a checkmate
-            if pieces_checking[0].get_position() in opponent_allowed_destinations:
-                return False
-
-            # if the piece is a cannon, check whether it is jumping an
-            # opponent's piece. If that piece can be moved, the cannon no
-            # longer has the general in check
-            if pieces_checking[0].get_piece_id()[1:3] == 'ca':
-                path_to_general = pieces_checking[0].get_path_to_general()
-                for position in path_to_general:
-                    piece_id_in_path = board.get_occupation(position)
-                    if piece_id_in_path is not None:
-                        if piece_id_in_path[0] == opponent_color[0]:
-                            piece_in_path = opponent_pieces[piece_id_in_path]
-                            if len(piece_in_path.get_allowed_moves()) > 0:
-                                return False
-
-        # check whether all pieces with the general in check can be blocked
-        # in a single move. Don't include soldiers, because they can't be
-        # blocked.
-        # First, get list of path_to_general sets
-        path_to_general_sets = [piece.get_path_to_general() for piece in
-                           pieces_checking if piece.get_piece_id()[1:3] != 'so']
-
-        # get positions the opponent must reach to block all paths
-        # if there is only one piece with the general in check, the
-        # positions_to_block will just be that piece's path_to_general
-        if path_to_general_sets != []:
-            positions_to_block = set.intersection(*path_to_general_sets)
-            if len(positions_to_block) > 0:
-                blocking_destinations = positions_to_block & \
-                                        opponent_allowed_destinations
-                if len(blocking_destinations) > 0:
-                    return False
+    def legal_moves(self):
+        """
+        Returns a list of the legal moves of the player whose turn it is, as
+        tuples of positions (from_pos, to_pos). Passing the turn is not
+        included. Moves that would put or leave the player in check are not
+        legal. The moves are found without printing anything or changing the
+        game, so the list is empty if the game is finished. If the player is in
+        check, only the moves that could get them out of check are tried (see
+        evasion_moves). Otherwise only the general's moves and the moves to or
+        from the squares of the pin_mask need to be made and taken back to see
+        whether they put the player in check.
+        """
+        return [decode_move(move) for move in self.encoded_legal_moves()]
+
+    def encoded_legal_moves(self):
+        """Returns an array (see MOVE_TYPECODE) of the legal moves of the
+        player whose turn it is, encoded as ints (see encode_move and
+        legal_moves). If there is a PositionCache, the moves are looked up
+        in it, and added to it if they aren't there. The cache is keyed by the
+        canonical_hash, and the moves of mirrored positions are stored
+        mirrored, so a position and its mirror image share an entry."""
+        if self.get_game_state() != 'UNFINISHED':
+            return array(MOVE_TYPECODE)
+
+        position_cache = self._position_cache
+        if position_cache is None:
+            return self._find_legal_moves()
+
+        position_hash = self.position_hash()
+        mirror_hash = self.mirror_position_hash()
+        mirrored = mirror_hash < position_hash
+        canonical_hash = mirror_hash if mirrored else position_hash
+        entry = position_cache.get(canonical_hash)
+        if entry is None:
+            moves = self._find_legal_moves()
+            canonical_moves = moves
+            if mirrored:
+                canonical_moves = array(MOVE_TYPECODE,
+                                        map(mirror_move, moves))
+            position_cache.put(canonical_hash, canonical_moves,
+                               self.is_in_check(self.get_turn()))
+        else:
+            moves = entry[0]
+            if mirrored:
+                moves = map(mirror_move, moves)
+
+        # the cached array is copied so that callers can change theirs
+        return array(MOVE_TYPECODE, moves)
+
+    def _find_legal_moves(self):
+        """Returns an array of the encoded legal moves of the player whose
+        turn it is, without using the PositionCache (see
+        encoded_legal_moves)."""
+        moves = array(MOVE_TYPECODE)
+        checking_masks = self._checking_masks()
+        pin_mask = self.pin_mask()
+        for piece in list(self.get_current_player().get_pieces().values()):
+            moves.extend(self._iter_legal_moves(piece, checking_masks,
+                                                pin_mask))
+        return moves
+
+    def legal_moves_from(self, position):
+        """
+        Takes a position (str) and returns a list of the legal moves of the
+        piece in that position, as tuples of positions (from_pos, to_pos). The
+        list is empty if the position is empty, the piece belongs to the player
+        whose turn it isn't, or the game is finished (see legal_moves).
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return []
 
-        return True
+        # confirm that the piece belongs to the player
+        piece_id = self.get_board().get_occupation(position)
+        current_player = self.get_current_player()
+        if piece_id not in current_player.get_pieces():
+            return []
+
+        return [decode_move(move) for move in self._iter_legal_moves(
+            current_player.get_pieces()[piece_id], self._checking_masks(),
+            self.pin_mask())]
+
+    def _iter_legal_moves(self, piece, checking_masks, pin_mask):
+        """Takes a Piece object of the player whose turn it is, the
+        checking_masks (see _checking_masks), and the pin_mask, and yields the
+        piece's legal moves encoded as ints (see encode_move and legal_moves).
+        Each move is yielded after any trial move has been taken back, so the
+        caller can stop at any move."""
+        from_move = piece.get_square() * NUM_SQUARES
+
+        # if the player is in check, only the moves that could get them out of
+        # check are candidates
+        allowed_mask = piece.get_allowed_mask() & \
+            self._evasion_mask(piece, checking_masks)
+
+        # if the player isn't in check, the moves of a piece other than the
+        # general that don't move to or from the squares of the pin_mask can't
+        # put the player in check
+        if checking_masks or piece.get_code() & TYPE_MASK == GENERAL or \
+                pin_mask & BITS[piece.get_square()]:
+            safe_mask = 0
+        else:
+            safe_mask = allowed_mask & ~pin_mask
+
+        # each other candidate move is made and taken back to see whether it
+        # puts or leaves the player in check
+        color = self.get_turn()
+        while allowed_mask:
+            to_bit = allowed_mask & -allowed_mask
+            allowed_mask ^= to_bit
+            move = from_move + to_bit.bit_length() - 1
+            if to_bit & safe_mask:
+                yield move
+                continue
+            self.push_encoded_move(move)
+            legal = not self.is_in_check(color)
+            self.pop_move()
+            if legal:
+                yield move
+
+    def evasion_moves(self):
+        """
+        Returns a list of the moves, as tuples of positions (from_pos, to_pos),
+        that could get the player whose turn it is out of check: the general's
+        moves, captures of the pieces that have the general in check, moves to
+        the positions in their path_to_general that block them, and moves of a
+        piece that is the screen of a cannon that has the general in check.
+        Every move that gets out of check is one of these, but they may still
+        leave the player in check (e.g., if they block only one of two pieces),
+        so legal_moves tries each of them. If the player isn't in check, all of
+        their pieces' allowed moves are returned.
+        """
+        checking_masks = self._checking_masks()
+        moves = []
+        for piece in self.get_current_player().get_pieces().values():
+            allowed_mask = piece.get_allowed_mask() & \
+                self._evasion_mask(piece, checking_masks)
+            position = piece.get_position()
+            moves.extend((position, to_pos) for to_pos in
+                         piece.get_allowed_moves()
+                         if BITS[SQUARE_INDEX[to_pos]] & allowed_mask)
+        return moves
+
+    def _checking_masks(self):
+        """Returns a list with a tuple (path mask, square bit) of bitboards
+        (int) for each of the opponent's pieces that have the general of the
+        player whose turn it is in check, where the path mask has the
+        positions in the piece's path_to_general. The masks are computed
+        before any moves are made and taken back, which update the
+        path_to_general sets."""
+        return [(positions_to_mask(piece.get_path_to_general()),
+                 BITS[piece.get_square()])
+                for piece in self.get_opponent().get_pieces_checking()]
+
+    def _evasion_mask(self, piece, checking_masks):
+        """Takes a Piece object of the player whose turn it is and the
+        checking_masks (see _checking_masks), and returns a bitboard (int) of
+        the destinations that could get the general out of check when the piece
+        moves there (see evasion_moves)."""
+        # the general can move out of check from any of the pieces
+        if piece.get_code() & TYPE_MASK == GENERAL:
+            return ALL_SQUARES
+
+        evasion_mask = ALL_SQUARES
+        piece_bit = BITS[piece.get_square()]
+        for path_mask, checking_bit in checking_masks:
+
+            # moving a cannon's screen out of its path gets out of check from
+            # that cannon wherever the screen moves
+            if path_mask & piece_bit:
+                continue
+
+            # otherwise the piece must capture the piece or block its path
+            evasion_mask &= path_mask | checking_bit
+
+        return evasion_mask
+
+    def pin_mask(self):
+        """
+        Returns a bitboard (int) of the squares where moving a piece of the
+        player whose turn it is, to or from the square, could put their general
+        in check. These are the intermediates of the opponent's hypothetical
+        moves to the general's square (see PATH_MASKS): the squares along the
+        rays of chariots, where a piece that moves away may be pinned, the
+        squares along the rays of cannons, where a piece that moves away may be
+        a screen and a piece that moves there may become a new screen, and the
+        legs of horses and elephants. The opponent's general is not included,
+        because generals don't put each other in check in this game.
+        """
+        color = COLOR_INDEX[self.get_turn()]
+        general_square = self.get_board().get_general_square(color)
+        pin_mask = 0
+        for piece in self.get_opponent().get_pieces().values():
+            code = piece.get_code()
+            if code & TYPE_MASK != GENERAL:
+                pin_mask |= PATH_MASKS[code][piece.get_square()].get(
+                    general_square, 0)
+        return pin_mask
 
     def make_move(self, from_pos, to_pos):
         """
@@ -187,157 +2327,695 @@ class JanggiGame:
         player whose turn it is and it must not result in the player putting
         themself in check. Determines if the move results in checkmate and
         updates the game_state, board, players, and pieces before updating
-        the turn.
+        the turn. Messages about the move are passed to the message handler
+        (see try_move).
 
         Parameters: from_pos and to_pos are strings representing positions
             (e.g., 'b3')
         Returns: True if the move is allowed, otherwise False.
         """
+        return self.try_move(from_pos, to_pos).is_legal()
+
+    def try_move(self, from_pos, to_pos):
+        """
+        Makes a move like make_move, and returns a MoveResult with the
+        MoveStatus, the captured piece, whether the move put the other player in
+        check, and the game state after the move. If the move is not allowed,
+        the status's message is passed to the message handler, and messages
+        are also passed when the move puts the other player in check, wins
+        the game, or draws it (see is_draw). With no message handler nothing
+        is printed.
+
+        Parameters: from_pos and to_pos are strings representing positions
+            (e.g., 'b3')
+        Returns: MoveResult
+        """
         # input validation
         for pos in [from_pos, to_pos]:
             if pos == '':
-                print('No position specified')
-                return False
-            if len(pos) < 2 or len(pos) > 3:
-                print('Invalid board position')
-                return False
-            if pos[0] < 'a' or pos[0] > 'i' or \
-                    int(pos[1:]) < 1 or int(pos[1:]) > 10:
-                print('Invalid board position')
-                return False
+                self._log(MoveStatus.NO_POSITION.value)
+                return MoveResult(MoveStatus.NO_POSITION)
+            if len(pos) < 2 or len(pos) > 3 or pos[0] < 'a' or \
+                    pos[0] > 'i' or int(pos[1:]) < 1 or int(pos[1:]) > 10:
+                self._log(MoveStatus.INVALID_POSITION.value)
+                return MoveResult(MoveStatus.INVALID_POSITION)
 
         # confirm game is unfinished
-        if self.get_game_state() != 'UNFINISHED':
-            print('The game is already finished.')
-            return False
+        game_state = self.get_game_state()
+        if game_state != 'UNFINISHED':
+            self._log(MoveStatus.GAME_FINISHED.value)
+            return MoveResult(MoveStatus.GAME_FINISHED, game_state=game_state)
 
         # allow passing turns
         color = self.get_turn()
         in_check = self.is_in_check(color)
         if from_pos == to_pos:
             if in_check:
-                print('Player is in check. Passing is not allowed.')
-                return False
+                self._log(MoveStatus.PASS_IN_CHECK.value)
+                return MoveResult(MoveStatus.PASS_IN_CHECK)
 
-            self.next_turn()
-            return True
+            self.push_move(from_pos, to_pos)
+            self._end_if_draw()
+            return MoveResult(MoveStatus.PASSED,
+                              game_state=self.get_game_state())
 
         # confirm that there is a piece to move
         board = self.get_board()
         piece_id = board.get_occupation(from_pos)
         if piece_id is None:
-            print("The position to move from is empty.")
-            return False
+            self._log(MoveStatus.EMPTY_POSITION.value)
+            return MoveResult(MoveStatus.EMPTY_POSITION)
 
         # confirm that the piece belongs to the player
         current_player = self.get_current_player()
         if piece_id not in current_player.get_pieces():
-            print("The piece belongs to the other player.")
-            return False
-
-        # determine whether the general is being moved
-        general_moving = False
-
-        if color == 'red':
-            general = current_player.get_pieces()['rge1']
-        else:
-            general = current_player.get_pieces()['bge1']
+            self._log(MoveStatus.OPPONENTS_PIECE.value)
+            return MoveResult(MoveStatus.OPPONENTS_PIECE)
 
+        # determine whether the general's move is allowed
         if piece_id[1:3] == 'ge':
-            general_moving = True
+            if color == 'red':
+                general = current_player.get_pieces()['rge1']
+            else:
+                general = current_player.get_pieces()['bge1']
 
-            # determine whether the general's move is allowed
             if to_pos not in general.get_allowed_moves():
-                print("The general can't move to that position.")
-                return False
+                self._log(MoveStatus.GENERAL_CANT_MOVE.value)
+                return MoveResult(MoveStatus.GENERAL_CANT_MOVE)
 
         # determine whether the move is allowed
         # this already will deny moves to positions occupied by a piece of the
         # same color
         piece = current_player.get_pieces()[piece_id]
         if to_pos not in piece.get_allowed_moves():
-            print("The piece can't move to that position.")
-            return False
+            self._log(MoveStatus.PIECE_CANT_MOVE.value)
+            return MoveResult(MoveStatus.PIECE_CANT_MOVE)
 
-        # if a piece is captured, remove it from the opponent's pieces
-        opponent = self.get_opponent()
-        captured_piece_id = board.get_occupation(to_pos)
-        if captured_piece_id is not None:
-            opponent.remove_piece(captured_piece_id)
-
-        # update the board and the moved piece's position attribute
-        board.move_piece(from_pos, to_pos)
-        if general_moving:
-            board.set_general_position(color, to_pos)
-        piece.set_position(to_pos)
+        # if the player isn't in check, a move by a piece other than the general
+        # that doesn't move to or from the squares of the pin_mask can't put
+        # them in check
+        move_mask = BITS[SQUARE_INDEX[from_pos]] | BITS[SQUARE_INDEX[to_pos]]
+        may_self_check = in_check or piece_id[1:3] == 'ge' or \
+            self.pin_mask() & move_mask
 
-        # update the pieces and players based on the state of the board after
-        # the move
-        opponent.update_pieces()
-        current_player.update_pieces()
-        self.update_generals()
+        # make the move, which also updates the turn
+        captured_piece_id = board.get_occupation(to_pos)
+        self.push_move(from_pos, to_pos)
 
         # the move must not put or leave the current player in check
-        if self.is_in_check(color):
-            print('The move is not allowed because it puts or leaves the player'
-                  ' in check.')
-            self.undo_move(from_pos, to_pos, captured_piece_id)
-            return False
+        if may_self_check and self.is_in_check(color):
+            self._log(MoveStatus.SELF_CHECK.value)
+            self.pop_move()
+            return MoveResult(MoveStatus.SELF_CHECK)
 
         # determine whether the move won the game
+        opponent = self.get_current_player()
         opponent_color = opponent.get_color()
-        if self.is_in_check(opponent_color):
-            print("The move put the other player in check.")
-            if self.is_checkmate():
-                print("Checkmate!")
+        check = self.is_in_check(opponent_color)
+        if check:
+            self._log("The move put the other player in check.")
+            if self._is_checkmated(opponent):
+                self._log("Checkmate!")
                 if opponent_color == 'red':
                     self.set_game_state('BLUE_WON')
                 else:
                     self.set_game_state('RED_WON')
 
-        self.next_turn()
-        return True
+        self._end_if_draw()
+        return MoveResult(MoveStatus.MOVED, captured_piece_id, check,
+                          self.get_game_state())
+
+    def _end_if_draw(self):
+        """Sets the game state to 'DRAW' if the game is unfinished and the
+        repetition_limit or move_limit has been reached (see is_draw)"""
+        if self.get_game_state() == 'UNFINISHED' and self.is_draw():
+            self._log('The game is a draw.')
+            self.set_game_state('DRAW')
 
     def undo_move(self, original_from_pos, original_to_pos, captured_piece_id):
         """
         Reverts the latest move that was from the original_from_pos to the
         original_to_pos (str positions). If the latest move did not result in
-        a capture, captured_piece_id must be None. Otherwise the piece in the
-        original_to_pos is moved back and the captured_piece_id (str) is used to
-        initialize the piece, place it on the board where it was before, and
-        add it back to its player.
+        a capture, captured_piece_id must be None. Otherwise the captured
+        piece is placed on the board where it was before, and added back to its
+        player. The move is taken back with pop_move, so the turn and the
+        number of turns are also restored to what they were before the move.
+        Raises a ValueError if the latest move was a different move.
         """
-        # update the piece's position attribute and its position on the board
-        board = self.get_board()
-        piece_id = board.get_occupation(original_to_pos)
-        current_player = self.get_current_player()
-        piece = current_player.get_pieces()[piece_id]
-        piece.set_position(original_from_pos)
+        if not self._move_stack:
+            raise ValueError('There is no move to undo.')
+
+        piece, from_square, to_square, captured_piece = \
+            self._move_stack[-1][:4]
+        if piece is None or SQUARE_NAMES[from_square] != original_from_pos or \
+                SQUARE_NAMES[to_square] != original_to_pos:
+            raise ValueError('The latest move was not from %s to %s.'
+                             % (original_from_pos, original_to_pos))
+        if captured_piece_id != (captured_piece and
+                                 captured_piece.get_piece_id()):
+            raise ValueError('The latest move did not capture %s.'
+                             % captured_piece_id)
+
+        self.pop_move()
+
+    def push_move(self, from_pos, to_pos):
+        """
+        Makes the move from the from_pos to the to_pos (str positions) for the
+        player whose turn it is and updates the turn, without validating it
+        or determining whether it won the game. A move with the same from_pos
+        and to_pos passes the turn (see push_encoded_move).
+        """
+        self.push_encoded_move(encode_move(from_pos, to_pos))
 
-        # if the general was moved, set the board's general_position
-        color = current_player.get_color()
-        if original_to_pos == board.get_general_position(color):
-            board.set_general_position(color, original_from_pos)
+    def push_encoded_move(self, move):
+        """
+        Makes the encoded move (int, see encode_move) for the player whose turn
+        it is and updates the turn, without validating it or determining
+        whether it won the game. PASS_MOVE passes the turn. The move is
+        recorded on the move_stack as a tuple of:
+            the moved Piece object (None for a pass), the squares (int) it
+            moved from and to, the captured Piece object (or None), the turn,
+            num_turns, and game_state before the move, each player's
+            destinations masks, and each general's allowed mask
+        so that pop_move can restore the game without creating any Piece
+        objects or updating all of the pieces.
+        """
+        red_player = self.get_red_player()
+        blue_player = self.get_blue_player()
+        red_general = red_player.get_pieces()['rge1']
+        blue_general = blue_player.get_pieces()['bge1']
+        attack_state = (red_player.get_destinations_mask(),
+                        red_player.get_palace_destinations_mask(),
+                        blue_player.get_destinations_mask(),
+                        blue_player.get_palace_destinations_mask(),
+                        red_general.get_allowed_mask(),
+                        blue_general.get_allowed_mask())
+
+        # passing the turn doesn't change the board
+        if move == PASS_MOVE:
+            self._move_stack.append((None, None, None, None, self.get_turn(),
+                                     self.get_num_turns(),
+                                     self.get_game_state(), attack_state))
+            self.next_turn()
+            self._count_position(1)
+            return
 
-        # update the moved piece's position on the board
-        board.move_piece(original_to_pos, original_from_pos)
+        board = self.get_board()
+        from_square, to_square = divmod(move, NUM_SQUARES)
+        piece = self.get_current_player().get_pieces()[
+            board.get_square_piece_id(from_square)]
 
-        # add a captured piece back
-        opponent = self.get_opponent()
+        # if a piece is captured, remove it from the opponent's pieces
+        captured_piece = None
+        captured_piece_id = board.get_square_piece_id(to_square)
         if captured_piece_id is not None:
+            opponent = self.get_opponent()
+            captured_piece = opponent.get_pieces()[captured_piece_id]
+            opponent.remove_piece(captured_piece_id)
 
-            # add it back to the board
-            board.set_occupation(captured_piece_id, original_to_pos)
+        self._move_stack.append((piece, from_square, to_square, captured_piece,
+                                 self.get_turn(), self.get_num_turns(),
+                                 self.get_game_state(), attack_state))
 
-            # initialize the piece and add it back to the player
-            opponent.add_piece(captured_piece_id, original_to_pos)
+        # update the board and the moved piece's position attribute, which
+        # also updates the general's square if the general is moving
+        board.move_piece_square(from_square, to_square)
+        piece.set_square(to_square)
 
         # update the pieces and players based on the state of the board after
-        # the move is undone
-        opponent.update_pieces()
-        current_player.update_pieces()
+        # the move
+        self._update_after_move(from_square, to_square)
+        self.next_turn()
+        self._count_position(1)
+
+    def pop_move(self):
+        """
+        Takes back the latest move made with push_move, restoring the board,
+        the pieces, the turn, the number of turns, the game state, the
+        position counts, and the players' and generals' moves to what they
+        were before the move. The
+        captured Piece object is put back, so no Piece objects are created.
+        Raises an IndexError if there is no move to take back.
+        """
+        piece, from_square, to_square, captured_piece, turn, num_turns, \
+            game_state, attack_state = self._move_stack.pop()
+        self._count_position(-1)
+        self._turn = turn
+        self._num_turns = num_turns
+        self.set_game_state(game_state)
+
+        # passing the turn didn't change the board
+        if piece is None:
+            return
+
+        # move the piece back, which also restores the general's square if the
+        # general moved
+        board = self.get_board()
+        board.move_piece_square(to_square, from_square)
+        piece.set_square(from_square)
+
+        # put a captured piece back on the board and add it back to its player.
+        # Its moves were computed for the board before the move, which is the
+        # board again now.
+        if captured_piece is not None:
+            board.set_square(to_square, captured_piece.get_piece_id())
+            self.get_opponent().restore_piece(captured_piece)
+
+        # mark the pieces affected by the move as out of date and restore the
+        # players' and generals' moves from before the move
+        red_player = self.get_red_player()
+        blue_player = self.get_blue_player()
+        changed_mask = BITS[from_square] | BITS[to_square]
+        red_player.update_pieces(changed_mask)
+        blue_player.update_pieces(changed_mask)
+
+        red_destinations_mask, red_palace_destinations_mask, \
+            blue_destinations_mask, blue_palace_destinations_mask, \
+            red_general_mask, blue_general_mask = attack_state
+        red_player.restore_masks(red_destinations_mask,
+                                 red_palace_destinations_mask)
+        blue_player.restore_masks(blue_destinations_mask,
+                                  blue_palace_destinations_mask)
+        red_general = red_player.get_pieces()['rge1']
+        red_general.set_allowed_mask(red_general_mask)
+        red_general.set_allowed_moves(None)
+        blue_general = blue_player.get_pieces()['bge1']
+        blue_general.set_allowed_mask(blue_general_mask)
+        blue_general.set_allowed_moves(None)
+
+        if self.get_debug_mode():
+            self._verify_update()
+
+    def _update_after_move(self, from_square, to_square):
+        """Takes the squares (int) that a piece moved from and to and updates
+        the pieces and players based on the state of the board after the move.
+        Only the pieces whose moves pass through, land on, or start from either
+        square are updated (see FOOTPRINT_MASKS)."""
+        changed_mask = BITS[from_square] | BITS[to_square]
+        self.get_red_player().update_pieces(changed_mask)
+        self.get_blue_player().update_pieces(changed_mask)
         self.update_generals()
 
+        if self.get_debug_mode():
+            self._verify_update()
+
+    def _verify_update(self):
+        """Updates all of the pieces and players and raises a RuntimeError if
+        that changes any piece's or player's moves, which means that updating
+        only the pieces affected by the last move missed something."""
+        def moves_state():
+            state = []
+            for player in (self.get_red_player(), self.get_blue_player()):
+                state.append((player.get_destinations_mask(),
+                              player.get_palace_destinations_mask(),
+                              [piece.get_piece_id() for piece in
+                               player.get_pieces_checking()]))
+                for piece_id, piece in player.get_pieces().items():
+                    state.append((piece_id, piece.get_allowed_moves(),
+                                  piece.get_allowed_palace_destinations(),
+                                  piece.get_path_to_general(),
+                                  piece.get_allowed_mask(),
+                                  piece.get_palace_mask()))
+            return state
+
+        updated_state = moves_state()
+        self.get_red_player().update_pieces()
+        self.get_blue_player().update_pieces()
+        self.update_generals()
+        full_state = moves_state()
+
+        for updated, full in zip(updated_state, full_state):
+            if updated != full:
+                raise RuntimeError('Incremental update does not match a full '
+                                   'update: %s != %s' % (updated, full))
+
+    def exchange_value(self, square):
+        """Takes a square (int) and returns the material (int, see
+        EXCHANGE_VALUES) that the player whose turn it is would win by
+        capturing on it with their least valuable pieces, while the opponent
+        recaptures with theirs (see static_exchange). Returns 0 if the player
+        can't capture on the square or would lose material by doing so."""
+        board = self._board
+        squares = board.get_squares()
+        color = COLOR_INDEX[self._turn]
+        if not squares[square] or squares[square] >> 3 == color:
+            return 0
+        bitboards = board.get_bitboards()
+        occupied = board.get_occupied()
+        attacker = least_valuable_attacker(bitboards, occupied, square, color)
+        if attacker is None:
+            return 0
+        return max(0, static_exchange(squares, bitboards, occupied, attacker,
+                                      square))
+
+    def see(self, move):
+        """Takes an encoded move (int, see encode_move) of the player whose
+        turn it is and returns the material (int, see EXCHANGE_VALUES) that
+        the move wins or loses (negative) once the opponent's recaptures and
+        the player's re-recaptures on its destination are resolved (see
+        static_exchange). Returns 0 for moves that don't capture and for
+        moves that aren't from a square of the player's pieces."""
+        if move == PASS_MOVE:
+            return 0
+        board = self._board
+        squares = board.get_squares()
+        color = COLOR_INDEX[self._turn]
+        from_square, to_square = divmod(move, NUM_SQUARES)
+        if not squares[from_square] or squares[from_square] >> 3 != color:
+            return 0
+        if not squares[to_square] or squares[to_square] >> 3 == color:
+            return 0
+        return static_exchange(squares, board.get_bitboards(),
+                               board.get_occupied(), from_square, to_square)
+
+    def best_move(self, depth=None, time_limit=None):
+        """Takes the maximum depth (int) in moves and the time limit (float)
+        in seconds of a search (see search), and returns the best move found
+        for the player whose turn it is as a tuple of positions (str) that can
+        be passed to make_move, or None if the game is finished."""
+        return self.search(depth, time_limit).get_move()
+
+    def search(self, depth=None, time_limit=None, transposition_table=None):
+        """
+        Searches for the best move of the player whose turn it is with negamax
+        alpha-beta search, and returns a SearchResult with the move, its score,
+        and the number of nodes searched and nodes per second.
+        The search is iteratively deepened: it searches 1 move deep, then 2,
+        and so on up to depth (DEFAULT_SEARCH_DEPTH if neither depth nor
+        time_limit is given, otherwise MAX_SEARCH_DEPTH). Each iteration tries
+        the best moves of the previous ones first, from the
+        transposition_table (a new TranspositionTable if None), and then the
+        captures of the most valuable pieces by the least valuable ones.
+        When time_limit (seconds) is given, the search stops when it runs out,
+        and the best move of the last completed iteration is returned.
+        The moves are made and taken back with push_encoded_move and pop_move,
+        so the rules are the same as for make_move. Positions are scored with
+        evaluate (in tenths of a point), and passing the turn is tried when
+        the player isn't in check.
+        """
+        start = time.perf_counter()
+        if depth is None:
+            depth = DEFAULT_SEARCH_DEPTH if time_limit is None \
+                else MAX_SEARCH_DEPTH
+        depth = min(depth, MAX_SEARCH_DEPTH)
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        deadline = None if time_limit is None else start + time_limit
+        search = _Search(transposition_table, deadline)
+
+        if self.get_game_state() != 'UNFINISHED':
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start)
+
+        moves = self.encoded_legal_moves()
+        if not self.is_in_check(self.get_turn()):
+            moves.append(PASS_MOVE)
+        if not moves:
+            return SearchResult(None, -MATE_SCORE, 0, 0,
+                                time.perf_counter() - start)
+
+        # if the first iteration doesn't finish, the first move is returned
+        best_move = self._order_moves(moves)[0]
+        best_score = 0
+        completed_depth = 0
+        stack_size = len(self._move_stack)
+        try:
+            for iteration_depth in range(1, depth + 1):
+                best_score, best_move = self._search_moves(
+                    moves, iteration_depth, search)
+                completed_depth = iteration_depth
+
+                # stop when a checkmate has been found for either player
+                if abs(best_score) >= MATE_THRESHOLD:
+                    break
+        except _SearchTimeout:
+            while len(self._move_stack) > stack_size:
+                self.pop_move()
+
+        return SearchResult(best_move, best_score, completed_depth,
+                            search.nodes, time.perf_counter() - start)
+
+    def _search_moves(self, moves, depth, search):
+        """Takes the root moves (array of encoded moves), the depth (int),
+        and the _Search, searches each move, and returns a tuple of the best
+        score (int) and the best move (int)."""
+        position_hash = self.position_hash()
+        entry = search.table.probe(position_hash)
+        hash_move = None if entry is None else entry[4]
+
+        alpha = -MATE_SCORE - 1
+        best_move = None
+        for move in self._order_moves(moves, hash_move):
+            self.push_encoded_move(move)
+            score = -self._negamax(depth - 1, 1, -MATE_SCORE - 1, -alpha,
+                                   search)
+            self.pop_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        search.table.store(position_hash, depth, alpha, EXACT_BOUND,
+                           best_move)
+        return alpha, best_move
+
+    def _negamax(self, depth, ply, alpha, beta, search):
+        """Takes the remaining depth (int), the number of moves (int) from
+        the root, the alpha and beta bounds (int), and the _Search, and returns
+        the score (int) of the position for the player whose turn it is. Raises
+        _SearchTimeout when the deadline has passed."""
+        search.nodes += 1
+        if search.deadline is not None and \
+                time.perf_counter() > search.deadline:
+            raise _SearchTimeout()
+        if self.is_draw():
+            return 0
+        if depth <= 0:
+            return self._evaluation()
+
+        # use the score of the position if it was searched deep enough, and
+        # otherwise try its best move first
+        table = search.table
+        position_hash = self.position_hash()
+        entry = table.probe(position_hash)
+        hash_move = None
+        if entry is not None:
+            _, entry_depth, entry_score, bound, hash_move = entry
+            entry_score = score_from_table(entry_score, ply)
+            if entry_depth >= depth:
+                if bound == EXACT_BOUND:
+                    return entry_score
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        moves = self.encoded_legal_moves()
+        if not self.is_in_check(self.get_turn()):
+            moves.append(PASS_MOVE)
+        elif not moves:
+            return -MATE_SCORE + ply  # checkmate
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE - 1
+        best_move = None
+        for move in self._order_moves(moves, hash_move):
+            self.push_encoded_move(move)
+            score = -self._negamax(depth - 1, ply + 1, -beta, -alpha, search)
+            self.pop_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT_BOUND
+        table.store(position_hash, depth, score_to_table(best_score, ply),
+                    bound, best_move)
+        return best_score
+
+    def _order_moves(self, moves, hash_move=None):
+        """Takes encoded moves and the best move (int) from the
+        transposition table or None, and returns a list of the moves in the
+        order they should be searched: the best move, the captures of the most
+        valuable pieces by the least valuable ones, the other moves, and then
+        passing the turn."""
+        squares = self._board.get_squares()
+        move_scores = []
+        for move in moves:
+            if move == hash_move:
+                move_score = 1 << 10
+            elif move == PASS_MOVE:
+                move_score = -1
+            else:
+                captured_code = squares[move % NUM_SQUARES]
+                if captured_code:
+                    move_score = \
+                        PIECE_VALUES[captured_code & TYPE_MASK] * 16 - \
+                        PIECE_VALUES[squares[move // NUM_SQUARES] & TYPE_MASK]
+                else:
+                    move_score = 0
+            move_scores.append((move_score, move))
+        move_scores.sort(key=lambda move_score: -move_score[0])
+        return [move for _, move in move_scores]
+
+    def checking_moves(self):
+        """Returns an array of the legal moves (encoded as ints, see
+        encoded_legal_moves) of the player whose turn it is that put the
+        opponent in check, i.e., that give the player pieces_checking (see
+        Player.get_pieces_checking)."""
+        moves = array(MOVE_TYPECODE)
+        player = self.get_current_player()
+        for move in self.encoded_legal_moves():
+            self.push_encoded_move(move)
+            if player.get_pieces_checking():
+                moves.append(move)
+            self.pop_move()
+        return moves
+
+    def find_mate(self, num_moves, max_nodes=DEFAULT_MATE_NODES):
+        """
+        Searches for a forced checkmate by the player whose turn it is (the
+        attacker) in at most num_moves (int) of their moves, and returns a
+        MateResult that says whether one was proven or disproven, with the
+        moves of the checkmate if it was proven.
+        The search is a proof-number search: it builds a tree where the
+        attacker only makes checking moves (see checking_moves) and the
+        defender makes all of their legal moves, which are the moves that get
+        them out of check (see evasion_moves), and it always expands the
+        position that would do the most to prove or disprove the checkmate.
+        Checkmate is as in try_move and is_checkmate: the defender is in check
+        and has no legal move. If the tree reaches max_nodes positions before
+        the checkmate is proven or disproven, the status is UNKNOWN. With
+        num_moves less than 1 there is no time for a checkmate, so it is
+        DISPROVEN.
+        """
+        start = time.perf_counter()
+        root = _ProofNode(None, None, True, num_moves)
+        num_nodes = 1
+        if num_moves < 1 or self.get_game_state() != 'UNFINISHED':
+            root.proof = PROOF_INFINITY
+            root.disproof = 0
+
+        while root.proof and root.disproof and num_nodes < max_nodes:
+
+            # make the moves to the most-proving node: the child that is
+            # easiest to prove at OR nodes and to disprove at AND nodes
+            node = root
+            while node.children is not None:
+                if node.attacker_to_move:
+                    node = min(node.children, key=lambda child: child.proof)
+                else:
+                    node = min(node.children,
+                               key=lambda child: child.disproof)
+                self.push_encoded_move(node.move)
+
+            num_nodes += self._expand_proof_node(node)
+
+            # update the proof and disproof numbers back to the root
+            while node is not root:
+                self.pop_move()
+                node = node.parent
+                node.update()
+
+        # the line follows a proven child at OR nodes and the child that is
+        # hardest to disprove at AND nodes
+        line = []
+        node = root
+        if not root.proof:
+            status = MateStatus.PROVEN
+            while node.children:
+                if node.attacker_to_move:
+                    node = min(node.children, key=lambda child: child.proof)
+                else:
+                    node = max(node.children,
+                               key=lambda child: child.disproof)
+                line.append(node.move)
+        elif not root.disproof:
+            status = MateStatus.DISPROVEN
+        else:
+            status = MateStatus.UNKNOWN
+
+        return MateResult(status, line, num_nodes,
+                          time.perf_counter() - start)
+
+    def _expand_proof_node(self, node):
+        """Takes a _ProofNode for the current position, adds its children,
+        sets its proof and disproof numbers, and returns the number of
+        children (int) (see find_mate)."""
+        if node.attacker_to_move:
+            if self.is_draw():
+                moves = ()
+            else:
+                moves = self.checking_moves()
+            children = []
+            for move in moves:
+                child = _ProofNode(move, node, False, node.moves_left - 1)
+                self.push_encoded_move(move)
+
+                # the checks are checkmate or don't leave time for another one
+                if self._is_checkmated(self.get_current_player()):
+                    child.proof = 0
+                    child.disproof = PROOF_INFINITY
+                elif child.moves_left <= 0:
+                    child.proof = PROOF_INFINITY
+                    child.disproof = 0
+                self.pop_move()
+                children.append(child)
+        else:
+            children = [_ProofNode(move, node, True, node.moves_left)
+                        for move in self.encoded_legal_moves()]
+
+        node.children = children
+        if children:
+            node.update()
+        elif node.attacker_to_move:
+            node.proof = PROOF_INFINITY  # no checks
+            node.disproof = 0
+        else:
+            node.proof = 0  # no evasions, which is checkmate
+            node.disproof = PROOF_INFINITY
+        return len(children)
+
+    def evaluate(self):
+        """
+        Returns the evaluation (float) of the position in points for the
+        player whose turn it is: their material (see PIECE_VALUES) and
+        piece-square bonuses (see set_piece_square_tables) minus the
+        opponent's, with RED_HANDICAP added to red's points. The Board keeps
+        the score up to date as pieces move, including when moves are taken
+        back, so this takes constant time.
+        """
+        return self._evaluation() / EVAL_SCALE
+
+    def _evaluation(self):
+        """Returns the evaluation (int) in tenths of a point (see
+        evaluate)"""
+        score = self._board.get_score() + RED_HANDICAP
+        if self._turn == 'red':
+            return score
+        return -score
+
+    def get_piece_square_tables(self):
+        """Returns the piece-square tables used by evaluate (see
+        DEFAULT_PIECE_SQUARE_TABLES)"""
+        return self._piece_square_tables
+
+    def set_piece_square_tables(self, piece_square_tables):
+        """Takes piece-square tables, indexed by piece code (see piece_code),
+        each None or a sequence of the bonus (int, in tenths of a point) of
+        the piece on each square (int), and uses them for evaluate. Tables
+        can differ by piece type and color."""
+        self._piece_square_tables = piece_square_tables
+        self._board.set_square_values(build_square_values(piece_square_tables))
+
     def update_generals(self):
         """Updates each general's allowed_moves based on the current state of
         the board. Does not allow moves that put the general in check."""
@@ -349,29 +3027,26 @@ class JanggiGame:
 
         for player1, player2, general_id in players_general_ids:
             general = player1.get_pieces()[general_id]
-            color = general_id[0]
-            hyp_moves = general.get_hyp_moves()
-            allowed_moves = hyp_moves.copy()
-            opponent_palace_destinations = player2.get_allowed_palace_destinations()
-
-            # eliminate moves that put the general in check
-            for destination in hyp_moves:
-                if destination in opponent_palace_destinations:
-                    del allowed_moves[destination]
-                    continue
-
-                # eliminate moves with the destination occupied by a piece of
-                # the same color
-                piece_id_at_destination = board.get_occupation(destination)
-                if piece_id_at_destination is not None:
-                    if piece_id_at_destination[0] == color:
-                        del allowed_moves[destination]
-
-            general.set_allowed_moves(allowed_moves)
-
-            # update each player's allowed_destinations
-            allowed_destinations = player1.get_allowed_destinations()
-            allowed_destinations |= set(allowed_moves)
+            code = general.get_code()
+            square = general.get_square()
+
+            # eliminate moves with the destination occupied by a piece of the
+            # same color and moves that put the general in check
+            allowed_mask = 0
+            destinations = STEP_MASKS[code][square] & \
+                ~board.get_occupied()[code >> 3]
+            while destinations:
+                destination_bit = destinations & -destinations
+                destinations ^= destination_bit
+                if not self.is_square_attacked(
+                        destination_bit.bit_length() - 1,
+                        player2.get_color(), palace=True):
+                    allowed_mask |= destination_bit
+
+            # the dictionary of allowed moves is built from the mask when it
+            # is read (see General.update_allowed_moves)
+            general.set_allowed_mask(allowed_mask)
+            general.set_allowed_moves(None)
 
 
 class Board:
@@ -381,24 +3056,84 @@ class Board:
     print the board. A Board object is created by the JanggiGame and is passed
     to the Players and the Pieces because they all need access in order to see
     what Piece is in a given position.
+    The pieces are stored in a flat array of 90 squares (see SQUARE_NAMES) so
+    that the game logic can work with integers. The methods that take positions
+    as strings (e.g., 'a1') translate them to squares and are kept for the GUI,
+    the text mode, and other callers that use positions.
+    The squares of each piece type are also kept as bitboards (see BITS), so
+    that sets of squares can be combined with integer operations.
 
     Data members: See __init__
-    Methods: get_general_position, set_general_position, move_piece, get_board,
-        display_board, get_occupation, set_occupation, clear_position,
-        _init_board_dict
+    Methods: get_general_position, set_general_position, get_general_square,
+        move_piece, move_piece_square, get_board, get_squares, get_bitboards,
+        get_occupied, display_board, get_occupation, set_occupation,
+        clear_position, get_square_code, get_square_piece_id, set_square,
+        clear_square, get_version, get_hash, get_mirror_hash, get_score,
+        get_square_values, set_square_values, clone, _init_board_dict
     """
+    __slots__ = ('_version', '_hash', '_mirror_hash', '_squares', '_piece_ids',
+                 '_bitboards', '_occupied', '_general_squares', '_score',
+                 '_square_values')
+
     def __init__(self):
         """
         Creates a Janggi Board.
-        Private data member:
-            board: dictionary organized as {position (str): piece_id (str)} for
-                all positions on a Janggi board. The board is initialized with
-                the pieces in their starting positions for a Janggi game.
-            general_position: dictionary organized as
-                {color (str): position (str)}
+        Private data members:
+            squares: bytearray with the piece code (int) of the piece occupying
+                each square, or EMPTY (0) for unoccupied squares. The board is
+                initialized with the pieces in their starting positions for a
+                Janggi game.
+            piece_ids: list with the piece_id (str) of the piece occupying each
+                square, or None for unoccupied squares
+            general_squares: list with the square (int) of each general,
+                indexed by color (RED or BLUE)
+            bitboards: list with a bitboard (int) of the squares occupied by
+                each piece code
+            occupied: list with a bitboard (int) of the squares occupied by
+                each color, indexed by color
+            version: (int) position version, incremented each time a square
+                changes, so that values computed from the board can be cached
+                until it changes
+            hash: (int) Zobrist hash of the pieces on the squares (see
+                ZOBRIST_KEYS), which is updated each time a square changes
+            mirror_hash: (int) Zobrist hash of the pieces mirrored across the
+                e-file (see MIRROR_SQUARE), which is updated with the hash
+            square_values: table of the value (int, in tenths of a point) of
+                each piece code on each square (see build_square_values)
+            score: (int) sum of the square_values of the pieces, i.e., red's
+                material and bonuses minus blue's, which is updated each time
+                a square changes
         """
-        self._general_position = {'red': 'e2', 'blue': 'e9'}
-        self._board = self._init_board_dict()
+        self._version = 0
+        self._hash = 0
+        self._mirror_hash = 0
+        self._square_values = DEFAULT_SQUARE_VALUES
+        self._score = 0
+        self._squares = bytearray(NUM_SQUARES)
+        self._piece_ids = [None] * NUM_SQUARES
+        self._bitboards = [0] * 16
+        self._occupied = [0, 0]
+        self._general_squares = [SQUARE_INDEX['e2'], SQUARE_INDEX['e9']]
+
+        for position, piece_id in self._init_board_dict().items():
+            if piece_id != '----':
+                self.set_square(SQUARE_INDEX[position], piece_id)
+
+    def clone(self):
+        """Returns a new Board with a copy of the squares, piece_ids,
+        bitboards, general squares, and version."""
+        board = Board.__new__(Board)
+        board._version = self._version
+        board._hash = self._hash
+        board._mirror_hash = self._mirror_hash
+        board._square_values = self._square_values
+        board._score = self._score
+        board._squares = self._squares[:]
+        board._piece_ids = self._piece_ids[:]
+        board._bitboards = self._bitboards[:]
+        board._occupied = self._occupied[:]
+        board._general_squares = self._general_squares[:]
+        return board
 
     def _init_board_dict(self):
         """Returns the board dictionary {position (str): piece_id (str)}
@@ -425,88 +3160,205 @@ class Board:
     def get_general_position(self, color):
         """Takes a color (str 'red' or 'blue') and returns the position of
         the corresponding general."""
-        if color == 'red':
-            return self._general_position['red']
-        return self._general_position['blue']
+        return SQUARE_NAMES[self._general_squares[COLOR_INDEX[color]]]
 
     def set_general_position(self, color, position):
         """Takes a position (str) and a color (str 'red' or 'blue') of a general
-        and updates the general_position dictionary."""
-        if color == 'red':
-            self._general_position['red'] = position
-        else:
-            self._general_position['blue'] = position
+        and updates the general's square."""
+        self._general_squares[COLOR_INDEX[color]] = SQUARE_INDEX[position]
+
+    def get_general_square(self, color):
+        """Takes a color index (RED or BLUE) and returns the square (int) of
+        the corresponding general."""
+        return self._general_squares[color]
 
     def get_board(self):
-        """Returns the board dictionary."""
-        return self._board
+        """Returns a board dictionary {position (str): piece_id (str)} for all
+        positions on the board, with unoccupied positions indicated by
+        '----'. The dictionary is built from the squares, so changing it does
+        not change the board."""
+        piece_ids = self._piece_ids
+        return {SQUARE_NAMES[square]: piece_ids[square] or '----'
+                for square in range(NUM_SQUARES)}
+
+    def get_version(self):
+        """Returns the position version (int), which changes each time a
+        square changes."""
+        return self._version
+
+    def get_hash(self):
+        """Returns the Zobrist hash (int) of the pieces on the squares."""
+        return self._hash
+
+    def get_mirror_hash(self):
+        """Returns the Zobrist hash (int) of the pieces on the squares
+        mirrored across the e-file, which is the hash that the mirror image
+        of the board would have."""
+        return self._mirror_hash
+
+    def get_score(self):
+        """Returns the score (int, in tenths of a point) of the pieces on the
+        squares: red's material and bonuses minus blue's (see
+        build_square_values)."""
+        return self._score
+
+    def get_square_values(self):
+        """Returns the table of the values of the pieces on each square (see
+        build_square_values)."""
+        return self._square_values
+
+    def set_square_values(self, square_values):
+        """Takes a table of the values of the pieces on each square (see
+        build_square_values), uses it for the score, and adds up the score of
+        the pieces on the squares again."""
+        self._square_values = square_values
+        self._score = sum(square_values[code][square]
+                          for square, code in enumerate(self._squares)
+                          if code)
+
+    def get_squares(self):
+        """Returns the bytearray of piece codes, indexed by square."""
+        return self._squares
+
+    def get_bitboards(self):
+        """Returns the list of bitboards, indexed by piece code."""
+        return self._bitboards
+
+    def get_occupied(self):
+        """Returns the list of bitboards of the squares occupied by each color,
+        indexed by color."""
+        return self._occupied
 
     def get_occupation(self, position):
         """Takes a position (str) and returns the piece_id (str) of the piece
         occupying the position, or returns None if the position is
         unoccupied."""
-        board = self.get_board()
-        if board[position] == '----':
-            return None
-        return board[position]
+        return self._piece_ids[SQUARE_INDEX[position]]
 
     def set_occupation(self, piece_id, position):
-        """Takes a piece_id (str) and a position (str) and updates the board
-        dictionary."""
-        self._board[position] = piece_id
+        """Takes a piece_id (str) and a position (str) and puts the piece on the
+        board. A piece_id of '----' clears the position."""
+        if piece_id == '----':
+            self.clear_square(SQUARE_INDEX[position])
+        else:
+            self.set_square(SQUARE_INDEX[position], piece_id)
 
     def clear_position(self, position):
-        """Takes a position (str) and clears it by setting its value in the
-        board dictionary to '----'."""
-        self.set_occupation('----', position)
+        """Takes a position (str) and clears it so that it is unoccupied."""
+        self.clear_square(SQUARE_INDEX[position])
+
+    def get_square_code(self, square):
+        """Takes a square (int) and returns the code (int) of the piece
+        occupying it, or EMPTY if the square is unoccupied."""
+        return self._squares[square]
+
+    def get_square_piece_id(self, square):
+        """Takes a square (int) and returns the piece_id (str) of the piece
+        occupying it, or None if the square is unoccupied."""
+        return self._piece_ids[square]
+
+    def set_square(self, square, piece_id):
+        """Takes a square (int) and a piece_id (str) and puts the piece on the
+        square, replacing any piece that was there."""
+        self.clear_square(square)
+        code = piece_code(piece_id)
+        self._squares[square] = code
+        self._piece_ids[square] = piece_id
+        self._bitboards[code] |= BITS[square]
+        self._occupied[code >> 3] |= BITS[square]
+        self._hash ^= ZOBRIST_KEYS[code][square]
+        self._mirror_hash ^= ZOBRIST_KEYS[code][MIRROR_SQUARE[square]]
+        self._score += self._square_values[code][square]
+
+    def clear_square(self, square):
+        """Takes a square (int) and clears it so that it is unoccupied."""
+        code = self._squares[square]
+        if code:
+            self._bitboards[code] ^= BITS[square]
+            self._occupied[code >> 3] ^= BITS[square]
+            self._hash ^= ZOBRIST_KEYS[code][square]
+            self._mirror_hash ^= ZOBRIST_KEYS[code][MIRROR_SQUARE[square]]
+            self._score -= self._square_values[code][square]
+        self._squares[square] = EMPTY
+        self._piece_ids[square] = None
+        self._version += 1
 
     def move_piece(self, from_pos, to_pos):
         """
         Takes positions (str) to move a piece from and to, and updates the
         board. If the piece that is moving is a general, updates the
-        general_position dictionary.
+        general's position.
         Returns the piece_id (str) of a captured piece, or None if the
         destination was unoccupied.
         """
-        moving_piece_id = self.get_occupation(from_pos)
-        captured_piece_id = self.get_occupation(to_pos)  # None if no capture
+        return self.move_piece_square(SQUARE_INDEX[from_pos],
+                                      SQUARE_INDEX[to_pos])
 
-        # if moving piece is a general update its position in the
-        # general_position dictionary
-        if moving_piece_id[1:3] == 'ge':
-            if moving_piece_id[0] == 'r':
-                color = 'red'
-            else:
-                color = 'blue'
-            self.set_general_position(color, to_pos)
+    def move_piece_square(self, from_square, to_square):
+        """
+        Takes squares (int) to move a piece from and to, and updates the
+        board. If the piece that is moving is a general, updates the
+        general's square.
+        Returns the piece_id (str) of a captured piece, or None if the
+        destination was unoccupied.
+        """
+        squares = self._squares
+        piece_ids = self._piece_ids
+        code = squares[from_square]
+        captured_piece_id = piece_ids[to_square]  # None if no capture
+
+        # if moving piece is a general update its square
+        if code & TYPE_MASK == GENERAL:
+            self._general_squares[code >> 3] = to_square
+
+        # update the bitboards
+        captured_code = squares[to_square]
+        if captured_code:
+            self._bitboards[captured_code] ^= BITS[to_square]
+            self._occupied[captured_code >> 3] ^= BITS[to_square]
+            self._hash ^= ZOBRIST_KEYS[captured_code][to_square]
+            self._mirror_hash ^= \
+                ZOBRIST_KEYS[captured_code][MIRROR_SQUARE[to_square]]
+            self._score -= self._square_values[captured_code][to_square]
+        move_bits = BITS[from_square] | BITS[to_square]
+        self._bitboards[code] ^= move_bits
+        self._occupied[code >> 3] ^= move_bits
+        zobrist_keys = ZOBRIST_KEYS[code]
+        self._hash ^= zobrist_keys[from_square] ^ zobrist_keys[to_square]
+        self._mirror_hash ^= zobrist_keys[MIRROR_SQUARE[from_square]] ^ \
+            zobrist_keys[MIRROR_SQUARE[to_square]]
+        square_values = self._square_values[code]
+        self._score += square_values[to_square] - square_values[from_square]
 
         # update the board
-        self.clear_position(from_pos)
-        self.set_occupation(moving_piece_id, to_pos)
+        squares[to_square] = code
+        piece_ids[to_square] = piece_ids[from_square]
+        squares[from_square] = EMPTY
+        piece_ids[from_square] = None
+        self._version += 1
 
         return captured_piece_id
 
     def display_board(self):
         """Displays the board with the pieces in their current positions."""
-        board = self.get_board()
+        piece_ids = self._piece_ids
 
         # print the column headers
         print('     a    b    c    d    e    f    g    h    i')
 
         # print the board, one row at a time, by first making a list for the row
-        for row in range(1, 11):
+        for row in range(NUM_ROWS):
 
             # start row with number
-            row_list = [str(row)]
+            row_list = [str(row + 1)]
 
             # extra space after single digits so they match the '10 '
-            if row < 10:
+            if row < 9:
                 row_list.append('')
 
             # fill the row_list
-            for col in 'abcdefghi':
-                position = col + str(row)
-                row_list.append(board[position])
+            for square in range(row * NUM_COLS, (row + 1) * NUM_COLS):
+                row_list.append(piece_ids[square] or '----')
 
             # display piece_ids in row_list separated by spaces
             print(*row_list)
@@ -521,42 +3373,62 @@ class Player:
     There are two Players in the game. They each have a collection of Piece
     objects which they initialize in their starting positions. The Player has a
     method to make all of its Pieces update their data members based on the
-    current state of the board. The Player keeps sets of allowed_destinations
-    which are used by the JanggiGame and the opposing Player's General to
-    determine whether they are in check or checkmate. The Player is passed the
+    current state of the board. The Player keeps the squares of its
+    allowed_destinations as bitboards (see BITS), which are used by the
+    JanggiGame and the opposing Player's General to determine whether they are
+    in check or checkmate. The Player is passed the
     Board from the JanggiGame so that it can pass it on to the Pieces which need
     it to determine whether positions are occupied.
+    The allowed_destinations and pieces_checking are computed when they are
+    first read and kept until the board's position version changes (see
+    Board.get_version).
 
     Data members: See __init__
     Methods: get_color, get_pieces, get_pieces_checking, set_pieces_checking,
         get_board, get_allowed_destinations, set_allowed_destinations,
         get_allowed_palace_destinations, set_allowed_palace_destinations,
-        add_piece, remove_piece, update_pieces, _init_pieces
+        get_destinations_mask, set_destinations_mask,
+        get_palace_destinations_mask, set_palace_destinations_mask,
+        add_piece, restore_piece, remove_piece, update_pieces, restore_masks,
+        clone,
+        _update_masks,
+        _update_pieces_checking, _init_pieces
     """
+    __slots__ = ('_destinations_mask', '_palace_destinations_mask', '_color',
+                 '_pieces', '_pieces_checking', '_board', '_masks_version',
+                 '_checking_version')
+
     def __init__(self, color, board):
         """
         Creates a Janggi Player and calls _init_pieces to initialize the Piece
         objects and add them to the player's pieces dictionary
 
         Private data members:
-            allowed_destinations: set of destinations that the player's pieces
-                can legally reach given the current state of the board
-            allowed_palace_destinations = set of destinations in the opponent's
-                palace that can be reached in a legal move or one that would
-                be legal except it is occupied by a piece that belongs to the
-                player
+            destinations_mask: bitboard (int) of the allowed destinations, the
+                destinations that the player's pieces can legally reach given
+                the current state of the board
+            palace_destinations_mask = bitboard (int) of the allowed palace
+                destinations, the destinations in the opponent's palace that
+                can be reached in a legal move or one that would be legal
+                except it is occupied by a piece that belongs to the player
             color: (str) 'blue' or 'red'
             pieces: dictionary with piece_id as keys and Piece objects as values
             pieces_checking: list of Piece objects that have the opposing
                 general in check
             board: Board object
+            masks_version: (int) the board's position version when the
+                destinations masks were computed, or -1 if they are out of date
+            checking_version: (int) the board's position version when
+                pieces_checking was computed, or -1 if it is out of date
         """
-        self._allowed_destinations = set()
-        self._allowed_palace_destinations = set()
+        self._destinations_mask = 0
+        self._palace_destinations_mask = 0
         self._color = color
         self._pieces = {}
         self._pieces_checking = []
         self._board = board
+        self._masks_version = -1
+        self._checking_version = -1
         self._init_pieces(board)
 
     def get_color(self):
@@ -570,11 +3442,14 @@ class Player:
     def get_pieces_checking(self):
         """Returns the Player's list of Piece objects with the opponent's
         general in check"""
+        if self._checking_version != self._board.get_version():
+            self._update_pieces_checking()
         return self._pieces_checking
 
     def set_pieces_checking(self, pieces_checking):
         """Sets the Player's pieces_checking to the list parameter"""
         self._pieces_checking = pieces_checking
+        self._checking_version = self._board.get_version()
 
     def add_piece(self, piece_id, position):
         """Takes a piece_id (str) and a position (str) and adds the piece_id and
@@ -595,6 +3470,13 @@ class Player:
             pieces[piece_id] = Horse(piece_id, position, board)
         elif piece_id[1:3] == 'so':
             pieces[piece_id] = Soldier(piece_id, position, board)
+        elif piece_id[1:3] == 'ge':
+            pieces[piece_id] = General(piece_id, position, board)
+
+    def restore_piece(self, piece):
+        """Takes a Piece object that was removed from the Player's pieces
+        dictionary (e.g., when it was captured) and adds it back."""
+        self.get_pieces()[piece.get_piece_id()] = piece
 
     def remove_piece(self, piece_id):
         """Takes a piece_id and removes it from the Player's pieces dictionary
@@ -603,59 +3485,130 @@ class Player:
         del pieces[piece_id]
 
     def get_allowed_destinations(self):
-        """Returns the allowed_destinations set"""
-        return self._allowed_destinations
+        """Returns a set of the allowed destinations (str)"""
+        return mask_to_positions(self.get_destinations_mask())
 
     def set_allowed_destinations(self, allowed_destinations):
-        """Sets the Player's allowed_destinations set to the set parameter"""
-        self._allowed_destinations = allowed_destinations
+        """Sets the Player's allowed destinations to the positions in the set
+        parameter"""
+        self.set_destinations_mask(positions_to_mask(allowed_destinations))
 
     def get_allowed_palace_destinations(self):
-        """Returns the allowed_palace_destinations set"""
-        return self._allowed_palace_destinations
+        """Returns a set of the allowed palace destinations (str)"""
+        return mask_to_positions(self.get_palace_destinations_mask())
 
     def set_allowed_palace_destinations(self, allowed_palace_destinations):
-        """Sets the Player's allowed_destinations set to the set parameter"""
-        self._allowed_palace_destinations = allowed_palace_destinations
+        """Sets the Player's allowed palace destinations to the positions in
+        the set parameter"""
+        self.set_palace_destinations_mask(
+            positions_to_mask(allowed_palace_destinations))
+
+    def get_destinations_mask(self):
+        """Returns the bitboard (int) of the allowed destinations"""
+        if self._masks_version != self._board.get_version():
+            self._update_masks()
+        return self._destinations_mask
+
+    def set_destinations_mask(self, destinations_mask):
+        """Sets the bitboard (int) of the allowed destinations"""
+        if self._masks_version != self._board.get_version():
+            self._update_masks()
+        self._destinations_mask = destinations_mask
+
+    def get_palace_destinations_mask(self):
+        """Returns the bitboard (int) of the allowed palace destinations"""
+        if self._masks_version != self._board.get_version():
+            self._update_masks()
+        return self._palace_destinations_mask
+
+    def set_palace_destinations_mask(self, palace_destinations_mask):
+        """Sets the bitboard (int) of the allowed palace destinations"""
+        if self._masks_version != self._board.get_version():
+            self._update_masks()
+        self._palace_destinations_mask = palace_destinations_mask
 
     def get_board(self):
         """Returns the Board object."""
         return self._board
 
-    def update_pieces(self):
+    def update_pieces(self, changed_mask=None):
         """
-        Updates each of the Player's pieces so that all of their data
-        members reflect the current state of the board, and updates the Player's
-        pieces_checking, allowed_destinations, and allowed_palace destinations
+        Marks the Player's pieces as out of date after the board changed, so
+        that all of their data members, and the Player's pieces_checking,
+        allowed_destinations, and allowed_palace destinations, are updated to
+        reflect the current state of the board the next time they are read.
+        Optionally takes a bitboard (int) of the squares that changed since the
+        last update, in which case only the pieces whose footprint (see
+        FOOTPRINT_MASKS) includes one of those squares are marked.
         """
-        pieces = self.get_pieces().values()  # pieces is now a list of objects
-        allowed_destinations = set()
-        allowed_palace_destinations = set()
-        pieces_checking = []
-
-        color = self.get_color()
+        for piece in self.get_pieces().values():
+            if changed_mask is None or \
+                    piece.get_footprint_mask() & changed_mask:
+                piece.invalidate()
+
+        self._masks_version = -1
+        self._checking_version = -1
+
+    def restore_masks(self, destinations_mask, palace_destinations_mask):
+        """Takes the bitboards (int) of the allowed destinations and allowed
+        palace destinations that were saved for the current state of the board
+        (e.g., before a move that was taken back) and sets them, so they
+        don't need to be computed again."""
+        self._destinations_mask = destinations_mask
+        self._palace_destinations_mask = palace_destinations_mask
+        self._masks_version = self._board.get_version()
+
+    def clone(self, board):
+        """Takes a Board object (a copy of the Player's board) and returns a
+        new Player with copies of the Player's pieces on that board. The
+        destinations masks are kept, because the board has the same version."""
+        player = Player.__new__(Player)
+        player._color = self._color
+        player._board = board
+        pieces = {piece_id: piece.clone(board)
+                  for piece_id, piece in self._pieces.items()}
+        player._pieces = pieces
+        player._destinations_mask = self._destinations_mask
+        player._palace_destinations_mask = self._palace_destinations_mask
+        player._masks_version = self._masks_version
+        player._pieces_checking = []
+        player._checking_version = -1
+        return player
+
+    def _update_masks(self):
+        """Updates the bitboards of the allowed destinations and allowed palace
+        destinations from the Player's pieces. The General's allowed moves are
+        the ones set by JanggiGame.update_generals."""
+        destinations_mask = 0
+        palace_destinations_mask = 0
+
+        for piece in self.get_pieces().values():
+            destinations_mask |= piece.get_allowed_mask()
+            palace_destinations_mask |= piece.get_palace_mask()
+
+        self._destinations_mask = destinations_mask
+        self._palace_destinations_mask = palace_destinations_mask
+        self._masks_version = self._board.get_version()
+
+    def _update_pieces_checking(self):
+        """Updates the Player's pieces_checking with the pieces that have the
+        opposing general in check. Only the pieces whose allowed moves include
+        the opposing general's square need their allowed_moves built."""
         board = self.get_board()
-        if color == 'red':
-            opposing_general_position = board.get_general_position('blue')
+        if self.get_color() == 'red':
+            opposing_general_square = board.get_general_square(BLUE)
         else:
-            opposing_general_position = board.get_general_position('red')
-
-        for piece in pieces:
-            piece.update_hyp_moves()
-            piece.update_allowed_moves()
-            piece.update_allowed_palace_destinations()
-
-            # add the piece's destinations to the player's sets
-            allowed_destinations |= set(piece.get_allowed_moves())
-            allowed_palace_destinations |= piece.get_allowed_palace_destinations()
+            opposing_general_square = board.get_general_square(RED)
+        opposing_general_position = SQUARE_NAMES[opposing_general_square]
+        general_bit = BITS[opposing_general_square]
+        pieces_checking = []
 
-            # if the piece has the opposing general in check add it to the
-            # Player's pieces_checking
-            if piece.is_checking(opposing_general_position):
+        for piece in self.get_pieces().values():
+            if piece.get_code() & TYPE_MASK != GENERAL and \
+                    piece.get_allowed_mask() & general_bit and \
+                    piece.is_checking(opposing_general_position):
                 pieces_checking.append(piece)
 
-        self.set_allowed_destinations(allowed_destinations)
-        self.set_allowed_palace_destinations(allowed_palace_destinations)
         self.set_pieces_checking(pieces_checking)
 
     def _init_pieces(self, board):
@@ -683,14 +3636,6 @@ class Player:
                       'rho2': Horse('rho2', 'h1', board), 'rch2': Chariot('rch2', 'i1', board)}
 
         self._pieces = pieces
-        allowed_destinations = set()
-
-        for piece in pieces.values():
-            piece.update_hyp_moves()
-            piece.update_allowed_moves()
-            allowed_destinations |= set(piece.get_allowed_moves())
-
-        self.set_allowed_destinations(allowed_destinations)
 
 
 class Piece:
@@ -700,16 +3645,28 @@ class Piece:
     the methods and data members of this class. Pieces need access to the board
     because they have methods to determine their allowed moves based on its
     current state.
+    A piece's moves are computed when they are first read and kept until a
+    change on the board invalidates them (see Player.update_pieces). The
+    dictionaries of allowed moves are only built if they are read.
+    Pieces use __slots__, and their hypothetical moves and the intermediates of
+    their moves are shared from the read-only tables, so that each piece
+    only stores a few references and ints.
 
     Data members: See __init__
-    Methods: get_position, set_position, get_hyp_moves, set_hyp_moves,
-        get_path_to_general, set_path_to_general, get piece_id,
+    Methods: get_position, set_position, set_square, get_hyp_moves,
+        set_hyp_moves, get_path_to_general, set_path_to_general, get piece_id,
         get_allowed_moves, set_allowed_moves, update_allowed_moves,
         get_allowed_palace_destinations, set_allowed_palace_destinations,
-        update_allowed_palace_destinations, get_board, is_checking
-        position_u, position_d, position_l, position_r,
-        position_ul, position_ur, position_dl, position_dr
+        update_allowed_palace_destinations, get_board, is_checking, get_code,
+        get_square, update_hyp_moves, update_moves, get_allowed_mask,
+        set_allowed_mask, get_palace_mask, update_masks, get_footprint_mask,
+        invalidate, clone, _refresh, position_u, position_d, position_l,
+        position_r, position_ul, position_ur, position_dl, position_dr
     """
+    __slots__ = ('_piece_id', '_code', '_square', '_hyp_moves',
+                 '_allowed_moves', '_allowed_palace_destinations', '_board',
+                 '_path_to_general', '_allowed_mask', '_palace_mask', '_stale')
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Janggi Piece.
@@ -721,30 +3678,43 @@ class Piece:
                                  soldier = 'so'
                 # is a number 1-5, for distinguishing between the same type
                     of piece
-            position: position on the board as 2 or 3-char string, with a letter
-                for the column, and number for the row (e.g., 'a1').
+            code: the piece's integer code on the board (see piece_code)
+            square: the square (int) of the piece's position on the board. The
+                position (str) is looked up in SQUARE_NAMES.
             hyp_moves: dictionary of hypothetical moves the piece can make with
                 destination positions as keys and lists of intermediate
                 positions that must be passed en route as values
                 ({dest: [interm1, interm2]}). Hypothetical moves do not consider
-                positions of other pieces.
+                positions of other pieces. None unless it was set with
+                set_hyp_moves, in which case it is used instead of the piece's
+                read-only entry of HYP_MOVE_DICTS. The entry is looked up when
+                it is read rather than kept on the piece, because the read-only
+                dictionaries can't be copied with copy.deepcopy or pickled.
             allowed_moves: dictionary of moves the piece can make based on the
                 positions of all other pieces on the board. The format is the
-                same as for hyp_moves ({dest: [interm1, interm2]}).
+                same as for hyp_moves ({dest: [interm1, interm2]}). None until
+                it is read.
             allowed_palace_destinations = set of destinations in the opponent's
                 palace that can be reached in a legal move or one that would
                 be legal except it is occupied by a piece that belongs to the
-                player
-            path_to_general = set of intermediate positions along the allowed
-                path from the piece to the opposing general
+                player. None until it is read.
+            path_to_general = frozenset of intermediate positions along the
+                allowed path from the piece to the opposing general
+            allowed_mask: bitboard (int) of the allowed moves' destinations
+            palace_mask: bitboard (int) of the allowed palace destinations
+            stale: (bool) True if the moves are out of date
         """
         self._piece_id = piece_id
-        self._position = position
-        self._hyp_moves = {}
-        self._allowed_moves = {}
-        self._allowed_palace_destinations = set()
+        self._code = piece_code(piece_id)
+        self._square = SQUARE_INDEX[position]
+        self._hyp_moves = None
+        self._allowed_moves = None
+        self._allowed_palace_destinations = None
         self._board = board
-        self._path_to_general = set()
+        self._path_to_general = frozenset()
+        self._allowed_mask = 0
+        self._palace_mask = 0
+        self._stale = True
 
     def get_piece_id(self):
         """Returns the piece_id"""
@@ -753,20 +3723,33 @@ class Piece:
     def get_position(self):
         """Returns the position on the board as 2 or 3-char string, with a letter
         for the column, and number for the row (e.g., 'a1')"""
-        return self._position
+        return SQUARE_NAMES[self._square]
 
     def set_position(self, position):
         """Sets the position on the board to the specified 2 or 3-char string,
         with a letter for the column, and number for the row (e.g., 'a1')"""
-        self._position = position
+        self.set_square(SQUARE_INDEX[position])
+
+    def set_square(self, square):
+        """Sets the square (int) of the piece's position on the board"""
+        self._square = square
+        self.invalidate()
+
+    def get_code(self):
+        """Returns the piece's integer code on the board"""
+        return self._code
+
+    def get_square(self):
+        """Returns the square (int) of the piece's position"""
+        return self._square
 
     def get_path_to_general(self):
-        """Returns the path_to_general set."""
+        """Returns the path_to_general frozenset."""
         return self._path_to_general
 
     def set_path_to_general(self, path_to_general):
-        """Takes a set (path_to_general) and sets the path_to_general data
-        member."""
+        """Takes a frozenset (path_to_general) and sets the path_to_general
+        data member."""
         self._path_to_general = path_to_general
 
     def is_checking(self, opposing_general_position):
@@ -777,21 +3760,39 @@ class Piece:
         allowed_moves = self.get_allowed_moves()
         if opposing_general_position in allowed_moves:
             intermediates = allowed_moves[opposing_general_position]
-            self.set_path_to_general(set(intermediates))
+            self.set_path_to_general(frozenset(intermediates))
             return True
 
         return False
 
     def get_hyp_moves(self):
-        """Returns the hyp_moves dictionary."""
+        """Returns the hyp_moves dictionary, which is the entry of
+        HYP_MOVE_DICTS for the piece's code and square unless one was set with
+        set_hyp_moves."""
+        if self._stale:
+            self._refresh()
+        if self._hyp_moves is None:
+            return HYP_MOVE_DICTS[self._code][self._square]
         return self._hyp_moves
 
     def set_hyp_moves(self, hyp_moves):
         """Sets hyp_moves to the specified dictionary"""
         self._hyp_moves = hyp_moves
 
+    def update_hyp_moves(self):
+        """Updates the piece's hypothetical moves dictionary. These moves do not
+        consider the locations of other pieces, so they are looked up in the
+        HYP_MOVE_DICTS table for the piece's code and square when they are
+        read (see get_hyp_moves)."""
+        self.set_hyp_moves(None)
+
     def get_allowed_moves(self):
-        """Returns the allowed_moves dictionary"""
+        """Returns the allowed_moves dictionary, building it if it hasn't
+        been built since the piece's moves were last invalidated"""
+        if self._stale:
+            self._refresh()
+        if self._allowed_moves is None:
+            self.update_allowed_moves()
         return self._allowed_moves
 
     def set_allowed_moves(self, allowed_moves):
@@ -799,7 +3800,12 @@ class Piece:
         self._allowed_moves = allowed_moves
 
     def get_allowed_palace_destinations(self):
-        """Returns the allowed_palace_destinations set"""
+        """Returns the allowed_palace_destinations set, building it if it
+        hasn't been built since the piece's moves were last invalidated"""
+        if self._stale:
+            self._refresh()
+        if self._allowed_palace_destinations is None:
+            self.update_allowed_palace_destinations()
         return self._allowed_palace_destinations
 
     def set_allowed_palace_destinations(self, allowed_palace_destinations):
@@ -810,6 +3816,76 @@ class Piece:
         """Returns the Board object"""
         return self._board
 
+    def invalidate(self):
+        """Marks the piece's moves as out of date, so that they are updated the
+        next time they are read."""
+        self._stale = True
+
+    def clone(self, board):
+        """Takes a Board object and returns a new piece of the same type with
+        a copy of the piece's data members on that board. The dictionaries and
+        sets of moves are shared, because they are replaced rather than changed
+        when the moves are updated."""
+        piece = object.__new__(type(self))
+        piece._piece_id = self._piece_id
+        piece._code = self._code
+        piece._square = self._square
+        piece._hyp_moves = self._hyp_moves
+        piece._allowed_moves = self._allowed_moves
+        piece._allowed_palace_destinations = \
+            self._allowed_palace_destinations
+        piece._board = board
+        piece._path_to_general = self._path_to_general
+        piece._allowed_mask = self._allowed_mask
+        piece._palace_mask = self._palace_mask
+        piece._stale = self._stale
+        return piece
+
+    def _refresh(self):
+        """Updates the piece's hypothetical moves and the bitboards of its
+        moves, and discards the dictionaries of its allowed moves, which are
+        built again when they are read."""
+        self._stale = False
+        self.update_hyp_moves()
+        self.update_masks()
+        self._allowed_moves = None
+        self._allowed_palace_destinations = None
+
+    def get_allowed_mask(self):
+        """Returns the bitboard (int) of the allowed moves' destinations"""
+        if self._stale:
+            self._refresh()
+        return self._allowed_mask
+
+    def set_allowed_mask(self, allowed_mask):
+        """Sets the bitboard (int) of the allowed moves' destinations"""
+        self._allowed_mask = allowed_mask
+
+    def get_palace_mask(self):
+        """Returns the bitboard (int) of the allowed palace destinations"""
+        if self._stale:
+            self._refresh()
+        return self._palace_mask
+
+    def get_footprint_mask(self):
+        """Returns the bitboard (int) of the squares whose occupation can
+        change the piece's moves"""
+        return FOOTPRINT_MASKS[self._code][self._square]
+
+    def update_masks(self):
+        """Updates the bitboards of the piece's allowed moves and allowed
+        palace destinations from the Board's bitboards (see move_masks)."""
+        board = self.get_board()
+        self._allowed_mask, self._palace_mask = move_masks(
+            board.get_bitboards(), board.get_occupied(), self._code,
+            self._square)
+
+    def update_moves(self):
+        """Updates the piece's allowed moves and allowed palace destinations.
+        Pieces that can find both in a single pass override this method."""
+        self.update_allowed_moves()
+        self.update_allowed_palace_destinations()
+
     def update_allowed_palace_destinations(self):
         """Updates the piece's set of allowed_palace_destinations. These are
         positions in the opposing palace that the piece can move to, including
@@ -820,9 +3896,6 @@ class Piece:
         hyp_moves = self.get_hyp_moves()
         allowed_moves = hyp_moves.copy()
 
-        red_palace = {'d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3'}
-        blue_palace = {'d8', 'e8', 'f8', 'd9', 'e9', 'f9', 'd10', 'e10', 'f10'}
-
         # eliminate moves with an occupied intermediate position unless the
         # general is the intermediate, because the general uses this info
         # to determine where it can't move, and it shouldn't be able to move
@@ -837,9 +3910,9 @@ class Piece:
 
         # find intersection of allowed_moves and the opposing player's palace
         if color == 'r':
-            allowed_palace_destinations = set(allowed_moves) & blue_palace
+            allowed_palace_destinations = set(allowed_moves) & BLUE_PALACE
         else:
-            allowed_palace_destinations = set(allowed_moves) & red_palace
+            allowed_palace_destinations = set(allowed_moves) & RED_PALACE
 
         self.set_allowed_palace_destinations(allowed_palace_destinations)
 
@@ -975,17 +4048,53 @@ class Piece:
         return position_dr
 
 
-class Cannon(Piece):
+class SlidingPiece(Piece):
+    """
+    Represents a piece that moves along rays (a cannon or a chariot), a
+    sub-class of Piece. The allowed moves and allowed palace destinations of
+    these pieces are both found by walking each ray once (see scan_rays), which
+    applies the rules for the piece's type.
+
+    Data members: See Piece.__init__
+    Methods: inherited methods, and overriding versions of update_moves,
+        update_allowed_moves, and update_allowed_palace_destinations
+    """
+    __slots__ = ()
+
+    def update_moves(self):
+        """Overrides the Piece's method. Chariots stop at the first piece, and
+        cannons must jump one piece that isn't a cannon. The allowed moves and
+        allowed palace destinations are both found by walking each ray once
+        (see scan_rays)."""
+        allowed_moves, allowed_palace_destinations = scan_rays(
+            self.get_board().get_squares(), self._square, self._code)
+        self.set_allowed_moves(allowed_moves)
+        self.set_allowed_palace_destinations(allowed_palace_destinations)
+
+    def update_allowed_moves(self):
+        """Overrides the Piece's method. Updates the allowed moves, along with
+        the allowed palace destinations, which are found in the same pass."""
+        self.update_moves()
+
+    def update_allowed_palace_destinations(self):
+        """Overrides the Piece's method. Updates the allowed palace
+        destinations, along with the allowed moves, which are found in the same
+        pass."""
+        self.update_moves()
+
+
+class Cannon(SlidingPiece):
     """
-    Represents a cannon, a sub-class of Piece.
+    Represents a cannon, a sub-class of SlidingPiece.
     Cannons can move horizontally or vertically any number of positions, but
     they must jump exactly one other piece, which may not be another cannon.
     They can move diagonally between corners of the palace.
 
     Data members: See __init__
-    Methods: inherited methods, update_hyp_moves, and overriding versions of
-        update_allowed_moves and update_allowed_palace_destinations
+    Methods: inherited methods
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Cannon with the data members of a Piece. The parameters are
@@ -996,164 +4105,19 @@ class Cannon(Piece):
         """
         super().__init__(piece_id, position, board)
 
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-
-        # iterate through all possible destinations, saving them with their
-        # corresponding intermediate positions as {dest.: [interm1, interm2, ...]}
-        for next_position in [self.position_u, self.position_d,
-                              self.position_l, self.position_r]:
-            # start at adjacent position because cannon can't move to it
-            destination = next_position()
-            intermediates = []
-            while next_position(destination) is not None:
-                # previous destination is intermediate of next destination
-                intermediates.append(destination)
-                destination = next_position(destination)
-                # add destination and its intermediates to dictionary
-                hyp_moves[destination] = list(intermediates)
-
-        # diagonal jumps from the corners of a palace
-        position = self.get_position()
-        red_corners = {'d1', 'f1', 'd3', 'f3'}
-        blue_corners = {'d8', 'f8', 'd10', 'f10'}
-        if position in red_corners or position in blue_corners:
-            if position == 'd1' or position == 'd8':
-                next_position = self.position_dr
-            if position == 'f1' or position == 'f8':
-                next_position = self.position_dl
-            if position == 'd3' or position == 'd10':
-                next_position = self.position_ur
-            if position == 'f3' or position == 'f10':
-                next_position = self.position_ul
-
-            intermediate = next_position()  # center of a palace
-            destination = next_position(intermediate)
-            hyp_moves[destination] = [intermediate]
-
-        self.set_hyp_moves(hyp_moves)
-
-    def update_allowed_moves(self):
-        """Updates and returns the piece's allowed moves dictionary. Allowed
-        moves are legal based on the current state of the board. This method
-        overrides the method inherited from Piece, because cannons have special
-        rules: They must jump one piece and it can't be a cannon."""
-        piece_id = self.get_piece_id()
-        color = piece_id[0]
-        board = self.get_board()
-        hyp_moves = self.get_hyp_moves()
-        allowed_moves = hyp_moves.copy()
-
-        # eliminate moves with the destination occupied by a cannon or a piece
-        # of the same color
-        for destination in hyp_moves:
-            piece_id_at_destination = board.get_occupation(destination)
-            if piece_id_at_destination is not None:
-                if piece_id_at_destination[0] == color or \
-                        piece_id_at_destination[1:3] == 'ca':
-                    del allowed_moves[destination]
-
-        # prevent iterating through already eliminated moves
-        hyp_moves = allowed_moves.copy()
-
-        # eliminate moves without an occupied intermediate position
-        for destination, intermediates in hyp_moves.items():
-            for intermediate in intermediates:
-                # if there is an intermediate, proceed to the next destination
-                if board.get_occupation(intermediate) is not None:
-                    break
-                # if current intermediate position is the last one in the list,
-                # then the path has no intermediates occupied
-                elif intermediate == intermediates[-1]:
-                    del allowed_moves[destination]
-
-        # prevent iterating through already eliminated moves
-        hyp_moves = allowed_moves.copy()
-
-        # eliminate moves with >1 occupied intermediate position
-        # and those with only 1 if it is a cannon
-        for destination, intermediates in hyp_moves.items():
-            num_intermediate_pieces = 0  # initialize counter
-            for intermediate in intermediates:
-                piece_id_at_intermediate = board.get_occupation(intermediate)
-                if piece_id_at_intermediate is not None:
-                    num_intermediate_pieces += 1
-                    if piece_id_at_intermediate[1:3] == 'ca' or \
-                            num_intermediate_pieces > 1:
-                            if destination in allowed_moves:  # not yet deleted
-                                del allowed_moves[destination]
 
-        self.set_allowed_moves(allowed_moves)
-
-    def update_allowed_palace_destinations(self):
-        """Updates the piece's set of allowed_palace_destinations. These are
-        positions in the opposing palace that the piece can move to, including
-        those that are occupied by a piece of the same color."""
-        piece_id = self.get_piece_id()
-        color = piece_id[0]
-        board = self.get_board()
-        hyp_moves = self.get_hyp_moves()
-        allowed_moves = hyp_moves.copy()
-
-        red_palace = {'d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3'}
-        blue_palace = {'d8', 'e8', 'f8', 'd9', 'e9', 'f9', 'd10', 'e10', 'f10'}
-
-        # eliminate moves without an occupied intermediate position
-        for destination, intermediates in hyp_moves.items():
-            for intermediate in intermediates:
-                # if there is an intermediate, proceed to the next destination
-                if board.get_occupation(intermediate) is not None:
-                    break
-                # if current intermediate position is the last one in the list,
-                # then the path has no intermediates occupied
-                elif intermediate == intermediates[-1]:
-                    del allowed_moves[destination]
-
-        # prevent iterating through already eliminated moves
-        hyp_moves = allowed_moves.copy()
-
-        # Eliminate moves with >1 occupied intermediate position
-        # and those with only 1 if it is a cannon.
-        # Also eliminate if the 1 piece is a general and it's the first
-        # intermediate encountered, because the purpose
-        # of allowed_palace_destinations is for the general to see where it
-        # can go; the general should be able to move away from a cannon even if
-        # the cannon can jump it.
-        for destination, intermediates in hyp_moves.items():
-            num_intermediate_pieces = 0  # initialize counter
-            for intermediate in intermediates:
-                piece_id_at_intermediate = board.get_occupation(intermediate)
-                if piece_id_at_intermediate is not None:
-                    num_intermediate_pieces += 1
-                    if piece_id_at_intermediate[1:3] == 'ge':
-                        num_intermediate_pieces -= 1
-                    if piece_id_at_intermediate[1:3] == 'ca' or \
-                            (piece_id_at_intermediate[1:3] == 'ge' and \
-                            num_intermediate_pieces == 0) or \
-                            num_intermediate_pieces > 1:
-                        if destination in allowed_moves:  # not yet deleted
-                            del allowed_moves[destination]
-
-        # find intersection of allowed_moves and the opposing player's palace
-        if color == 'r':
-            allowed_palace_destinations = set(allowed_moves) & blue_palace
-        else:
-            allowed_palace_destinations = set(allowed_moves) & red_palace
-
-        self.set_allowed_palace_destinations(allowed_palace_destinations)
-
-class Chariot(Piece):
+class Chariot(SlidingPiece):
     """
-    Represents a chariot, a sub-class of Piece.
+    Represents a chariot, a sub-class of SlidingPiece.
     Chariots can move horizontally or vertically any number of positions, but
     they may not jump over another piece. They can move diagonally between
     corners of the palace.
 
     Data members: See __init__
-    Methods: inherited methods and update_hyp_moves
+    Methods: inherited methods
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Chariot with the data members of a Piece. The parameters are
@@ -1164,56 +4128,6 @@ class Chariot(Piece):
         """
         super().__init__(piece_id, position, board)
 
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-
-        # iterate through all possible destinations, saving them with their
-        # corresponding intermediate positions as {dest.: [interm1, interm2, ...]}
-        for next_position in [self.position_u, self.position_d,
-                              self.position_l, self.position_r]:
-            # initialize the destination
-            destination = self.get_position()
-            intermediates = []
-            while next_position(destination) is not None:
-                destination = next_position(destination)
-                # add destination and its intermediates to dictionary
-                hyp_moves[destination] = list(intermediates)
-                # previous destination is intermediate of next destination
-                intermediates.append(destination)
-
-        # diagonal moves from the corners of a palace
-        position = self.get_position()
-        red_corners = {'d1', 'f1', 'd3', 'f3'}
-        blue_corners = {'d8', 'f8', 'd10', 'f10'}
-        if position in red_corners or position in blue_corners:
-            if position == 'd1' or position == 'd8':
-                next_position = self.position_dr
-            if position == 'f1' or position == 'f8':
-                next_position = self.position_dl
-            if position == 'd3' or position == 'd10':
-                next_position = self.position_ur
-            if position == 'f3' or position == 'f10':
-                next_position = self.position_ul
-
-            destination = next_position()
-            hyp_moves[destination] = []  # add center of palace to dict
-            hyp_moves[next_position(destination)] = [destination]  # opp. corner
-
-        # diagonal moves from the center of a palace
-        red_center = 'e2'
-        blue_center = 'e9'
-        if position == blue_center:
-            for corner in blue_corners:
-                hyp_moves[corner] = []
-
-        if position == red_center:
-            for corner in red_corners:
-                hyp_moves[corner] = []
-
-        self.set_hyp_moves(hyp_moves)
-
 
 class Elephant(Piece):
     """
@@ -1223,8 +4137,10 @@ class Elephant(Piece):
     pieces.
 
     Data members: See __init__
-    Methods: inherited methods and update_hyp_moves
+    Methods: inherited methods
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates an Elephant with the data members of a Piece. The parameters are
@@ -1235,35 +4151,6 @@ class Elephant(Piece):
         """
         super().__init__(piece_id, position, board)
 
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-
-        # each horizontal/vertical direction splits into two diagonal directions
-        for next_position, branch_positions in {
-            self.position_u: [self.position_ul, self.position_ur],
-            self.position_d: [self.position_dl, self.position_dr],
-            self.position_l: [self.position_ul, self.position_dl],
-            self.position_r: [self.position_ur, self.position_dr]
-            }.items():
-
-            # the first intermediate is adjacent
-            intermediate_1 = next_position()
-            if intermediate_1 is not None:
-
-                # for each diagonal direction, take two more steps to arrive at
-                # the destination and pass a second intermediate
-                for branch_position in branch_positions:
-                    intermediate_2 = branch_position(intermediate_1)
-                    if intermediate_2 is not None:
-                        destination = branch_position(intermediate_2)
-                        if destination is not None:
-                            hyp_moves[destination] = \
-                                [intermediate_1, intermediate_2]
-
-        self.set_hyp_moves(hyp_moves)
-
 
 class General(Piece):
     """
@@ -1274,8 +4161,11 @@ class General(Piece):
 
     Data members: See __init__
     Methods: inherited methods, overriding update_allowed_moves, overriding
-        update_allowed_palace_destinations, and update_hyp_moves
+        update_allowed_palace_destinations, overriding get_footprint_mask, and
+        overriding _refresh
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a General with the data members of a Piece. The parameters are
@@ -1286,61 +4176,33 @@ class General(Piece):
         super().__init__(piece_id, position, board)
 
     def update_allowed_moves(self):
-        """Overrides the Piece's method. The General's allowed_destinations
-        are updated by JanggiGame.update_generals."""
-        self.set_allowed_moves({})
+        """Overrides the Piece's method. The General's allowed moves are
+        updated by JanggiGame.update_generals as a bitboard, which is used to
+        build the allowed_moves dictionary."""
+        allowed_mask = self.get_allowed_mask()
+        hyp_moves = HYP_MOVES[self.get_code()][self.get_square()]
+        self.set_allowed_moves(
+            {SQUARE_NAMES[destination]: intermediates
+             for destination, intermediates in hyp_moves
+             if BITS[destination] & allowed_mask})
 
     def update_allowed_palace_destinations(self):
         """Overrides the Piece's method. The General can't move out of its
-        own palace."""
-        pass
-
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-        color = self.get_piece_id()[0]  # 'b' or 'r'
-
-        # iterate through horizontal and vertical destinations
-        for next_position in [self.position_u, self.position_d,
-                              self.position_l, self.position_r]:
-
-            destination = next_position()
-            if destination is not None:
-
-                # check whether destination is in the palace
-                if destination[0] < 'd' or destination[0] > 'f':
-                    continue
-                if color == 'b' and int(destination[1:]) < 8:
-                    continue
-                if color == 'r' and int(destination[1:]) > 3:
-                    continue
-
-                hyp_moves[destination] = []  # one step so no intermediates
-
-        # diagonal destinations
-        position = self.get_position()
-        if color == 'r':
-            red_corners = {'d1', 'f1', 'd3', 'f3'}
-            red_center = 'e2'
-
-            if position in red_corners:
-                hyp_moves[red_center] = []
-            if position == red_center:
-                for corner in red_corners:
-                    hyp_moves[corner] = []
+        own palace, so it has no palace destinations."""
+        self.set_allowed_palace_destinations(set())
 
-        else:  # color == 'b'
-            blue_corners = {'d8', 'f8', 'd10', 'f10'}
-            blue_center = 'e9'
+    def get_footprint_mask(self):
+        """Overrides the Piece's method. The General's allowed moves depend on
+        where the opposing pieces can move, which can change after any move, so
+        all squares are returned."""
+        return ALL_SQUARES
 
-            if position in blue_corners:
-                hyp_moves[blue_center] = []
-            if position == blue_center:
-                for corner in blue_corners:
-                    hyp_moves[corner] = []
-
-        self.set_hyp_moves(hyp_moves)
+    def _refresh(self):
+        """Overrides the Piece's method. Only the hypothetical moves are
+        updated, because the General's allowed moves are updated by
+        JanggiGame.update_generals."""
+        self._stale = False
+        self.update_hyp_moves()
 
 
 class Guard(Piece):
@@ -1351,9 +4213,11 @@ class Guard(Piece):
     of the palace.
 
     Data members: See __init__
-    Methods: inherited methods, overriding update_allowed_palace_destinations
-        and update_hyp_moves
+    Methods: inherited methods and overriding
+        update_allowed_palace_destinations
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Guard with the data members of a Piece. The parameters are
@@ -1366,55 +4230,8 @@ class Guard(Piece):
 
     def update_allowed_palace_destinations(self):
         """Overrides the Piece's method. A Guard can't move out of its
-        own palace."""
-        pass
-
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-        color = self.get_piece_id()[0]  # 'b' or 'r'
-
-        # iterate through horizontal and vertical destinations
-        for next_position in [self.position_u, self.position_d,
-                              self.position_l, self.position_r]:
-
-            destination = next_position()
-            if destination is not None:
-
-                # check whether destination is in the palace
-                if destination[0] < 'd' or destination[0] > 'f':
-                    continue
-                if color == 'b' and int(destination[1:]) < 8:
-                    continue
-                if color == 'r' and int(destination[1:]) > 3:
-                    continue
-
-                hyp_moves[destination] = []  # one step so no intermediates
-
-        # diagonal destinations
-        position = self.get_position()
-        if color == 'r':
-            red_corners = {'d1', 'f1', 'd3', 'f3'}
-            red_center = 'e2'
-
-            if position in red_corners:
-                hyp_moves[red_center] = []
-            if position == red_center:
-                for corner in red_corners:
-                    hyp_moves[corner] = []
-
-        else:  # color == 'b'
-            blue_corners = {'d8', 'f8', 'd10', 'f10'}
-            blue_center = 'e9'
-
-            if position in blue_corners:
-                hyp_moves[blue_center] = []
-            if position == blue_center:
-                for corner in blue_corners:
-                    hyp_moves[corner] = []
-
-        self.set_hyp_moves(hyp_moves)
+        own palace, so it has no palace destinations."""
+        self.set_allowed_palace_destinations(set())
 
 
 class Horse(Piece):
@@ -1425,8 +4242,10 @@ class Horse(Piece):
     pieces.
 
     Data members: See __init__
-    Methods: inherited methods and update_hyp_moves
+    Methods: inherited methods
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Horse with the data members of a Piece. The parameters are
@@ -1437,31 +4256,6 @@ class Horse(Piece):
         """
         super().__init__(piece_id, position, board)
 
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-
-        # each horizontal/vertical direction splits into two diagonal directions
-        for next_position, branch_positions in {
-            self.position_u: [self.position_ul, self.position_ur],
-            self.position_d: [self.position_dl, self.position_dr],
-            self.position_l: [self.position_ul, self.position_dl],
-            self.position_r: [self.position_ur, self.position_dr]
-            }.items():
-
-            # the intermediate is adjacent
-            intermediate = next_position()
-            if intermediate is not None:
-
-                # for each diagonal direction, take a step to the destination
-                for branch_position in branch_positions:
-                    destination = branch_position(intermediate)
-                    if destination is not None:
-                        hyp_moves[destination] = [intermediate]
-
-        self.set_hyp_moves(hyp_moves)
-
 
 class Soldier(Piece):
     """
@@ -1470,8 +4264,10 @@ class Soldier(Piece):
     diagonally forward between corners in the palace.
 
     Data members: See __init__
-    Methods: inherited methods and update_hyp_moves
+    Methods: inherited methods
     """
+    __slots__ = ()
+
     def __init__(self, piece_id, position, board):
         """
         Creates a Soldier with the data members of a Piece. The parameters are
@@ -1482,42 +4278,11 @@ class Soldier(Piece):
         """
         super().__init__(piece_id, position, board)
 
-    def update_hyp_moves(self):
-        """Updates and returns the piece's hypothetical moves dictionary. These
-        moves do not consider the locations of other pieces."""
-        hyp_moves = {}
-        color = self.get_piece_id()[0]  # 'b' or 'r'
-
-        # forward direction depends on the color
-        if color == 'b':
-            forward = self.position_u
-        else:
-            forward = self.position_d
 
-        # iterate through all possible destinations
-        for next_position in [forward, self.position_l, self.position_r]:
-            destination = next_position()
-            if destination is not None:
-                hyp_moves[destination] = []
-
-        # soldiers can move diagonally forward in the palace
-        position = self.get_position()
-
-        if color == 'b':
-            if position == 'd3' or position == 'f3':  # palace corners
-                hyp_moves['e2'] = []
-            if position == 'e2':  # palace center
-                hyp_moves['d1'] = []
-                hyp_moves['f1'] = []
-
-        else:  # color == 'r'
-            if position == 'd8' or position == 'f8':  # palace corners
-                hyp_moves['e9'] = []
-            if position == 'e9':  # palace center
-                hyp_moves['d10'] = []
-                hyp_moves['f10'] = []
-
-        self.set_hyp_moves(hyp_moves)
+# Create the starting position once. Its moves are computed here, so that new
+# games start with them.
+_INITIAL_GAME = JanggiGame(message_handler=None)
+_INITIAL_GAME.legal_moves()
 
 
 def main():